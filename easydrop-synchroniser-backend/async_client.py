@@ -1,18 +1,63 @@
 import aiohttp
 import asyncio
-from typing import List, Dict, Any, Optional
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+class LatencyTracker:
+    """
+    Rolling GET latencies per store and endpoint, shared by every client in the
+    process so the hedging threshold survives across sync runs.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        self.min_samples = min_samples
+        self._window = window
+        self._samples: Dict[Tuple[str, ...], deque] = {}
+
+    def record(self, key: Tuple[str, ...], seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def p95(self, key: Tuple[str, ...]) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+latency_tracker = LatencyTracker()
 
 class AsyncClient:
-    def __init__(self, api_key: str, base_url: str = "https://easydrop.one/api/v1", ssl: bool = False):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://easydrop.one/api/v1",
+        ssl: bool = False,
+        connect_timeout: float = 10,
+        read_timeout: float = 60,
+        deadline: Optional[float] = None,
+        hedge: bool = False,
+        min_hedge_delay: float = 0.05,
+        label: Optional[str] = None
+    ):
         self.api_key = api_key
         self.base_url = base_url
         self.headers = {"Authorization": api_key}
         self.session: Optional[aiohttp.ClientSession] = None
         self.ssl: bool = ssl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline  # Absolute event loop time after which no request may run
+        self.hedge = hedge  # Duplicate slow idempotent GETs once they pass the observed p95
+        self.min_hedge_delay = min_hedge_delay
+        # Stores share base_url and differ only by API key; keep their latencies apart
+        self.label = label or api_key
+        self.stats = {"requests": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0, "cancelled": 0}
 
     async def __aenter__(self):
         connector = aiohttp.TCPConnector(ssl=self.ssl)
-        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -35,32 +80,92 @@ class AsyncClient:
         if 'limit' not in current_params:
             current_params['limit'] = 5000
 
+        # Filtered lookups (e.g. ?id=) are far faster than full catalog pages; track them apart
+        latency_key = (self.base_url, self.label, endpoint + "?" + ",".join(sorted(k for k in current_params if k != 'limit')))
+
         while url:
-            async with self.session.get(url, params=current_params) as response:
+            data = await self._hedged_get_json(latency_key, url, current_params)
+
+            if isinstance(data, list):
+                all_results.extend(data)
+                # If it's a raw list, we assume no pagination metadata is provided 
+                # or we reached the end if we rely on a single big fetch.
+                # To be safe regarding the "strict" prompt saying it's a list:
+                # We just return this list.
+                break 
+            elif isinstance(data, dict) and 'results' in data:
+                # Handle DRF-style pagination if it happens to occur
+                results = data.get('results', [])
+                all_results.extend(results)
+                url = data.get('next') # Update URL for next page
+                current_params = {} # Params are usually encoded in the 'next' URL
+            else:
+                # Unexpected format, treat as single object or error? 
+                # Based on specs, we expect List or Dict w/ results.
+                # If it is just a dict representing one object, wrap it.
+                all_results.append(data)
+                break
+
+        return all_results
+
+    def _request_timeout(self) -> aiohttp.ClientTimeout:
+        """Per-request timeout, capped by whatever is left of the deadline budget."""
+        total = None
+        if self.deadline is not None:
+            total = self.deadline - asyncio.get_running_loop().time()
+            if total <= 0:
+                raise asyncio.TimeoutError("Sync deadline exceeded before request was sent")
+        return aiohttp.ClientTimeout(total=total, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    async def _get_json(self, latency_key: Tuple[str, ...], url: str, params: Dict[str, Any]) -> Any:
+        self.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            async with self.session.get(url, params=params, timeout=self._request_timeout()) as response:
                 response.raise_for_status()
                 data = await response.json()
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        latency_tracker.record(latency_key, time.monotonic() - started)
+        return data
+
+    async def _hedged_get_json(self, latency_key: Tuple[str, ...], url: str, params: Dict[str, Any]) -> Any:
+        """
+        GET with optional hedging: if the first attempt is still running after the
+        endpoint's observed p95, a duplicate is sent and whichever answers first wins.
+        """
+        p95 = latency_tracker.p95(latency_key) if self.hedge else None
+        if p95 is None:
+            return await self._get_json(latency_key, url, params)
 
-                if isinstance(data, list):
-                    all_results.extend(data)
-                    # If it's a raw list, we assume no pagination metadata is provided 
-                    # or we reached the end if we rely on a single big fetch.
-                    # To be safe regarding the "strict" prompt saying it's a list:
-                    # We just return this list.
-                    break 
-                elif isinstance(data, dict) and 'results' in data:
-                    # Handle DRF-style pagination if it happens to occur
-                    results = data.get('results', [])
-                    all_results.extend(results)
-                    url = data.get('next') # Update URL for next page
-                    current_params = {} # Params are usually encoded in the 'next' URL
-                else:
-                    # Unexpected format, treat as single object or error? 
-                    # Based on specs, we expect List or Dict w/ results.
-                    # If it is just a dict representing one object, wrap it.
-                    all_results.append(data)
-                    break
+        primary = asyncio.create_task(self._get_json(latency_key, url, params))
+        backup = None
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=max(p95, self.min_hedge_delay))
+            if not done:
+                self.stats["hedged"] += 1
+                backup = asyncio.create_task(self._get_json(latency_key, url, dict(params)))
+                tasks.append(backup)
 
-        return all_results
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+            # Every attempt failed: surface the primary's error
+            return primary.result()
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            self.stats["cancelled"] += len(losers)
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
 
     async def get_all_items(self) -> List[Dict[str, Any]]:
         return await self._fetch("/item/")
@@ -68,6 +173,12 @@ class AsyncClient:
     async def get_all_sizes(self) -> List[Dict[str, Any]]:
         return await self._fetch("/size/")
 
+    async def get_item(self, item_id: int) -> List[Dict[str, Any]]:
+        return await self._fetch("/item/", {"id": item_id})
+
+    async def get_item_sizes(self, item_id: int) -> List[Dict[str, Any]]:
+        return await self._fetch("/size/", {"item_id": item_id})
+
     async def update_item_price(self, item_id: int, price: int, nal: int):
         if not self.session:
             raise RuntimeError("Client session not initialized.")
@@ -77,7 +188,7 @@ class AsyncClient:
             "drop_price": price,
             "nal": nal
         }
-        async with self.session.put(f"{self.base_url}/item/", json=payload) as response:
+        async with self.session.put(f"{self.base_url}/item/", json=payload, timeout=self._request_timeout()) as response:
             if response.status >= 400:
                 text = await response.text()
                 print(f"Failed to update item {item_id}: {response.status} - {text}")
@@ -92,7 +203,7 @@ class AsyncClient:
             "val": val,
             "qty": qty
         }
-        async with self.session.put(f"{self.base_url}/size/", json=payload) as response:
+        async with self.session.put(f"{self.base_url}/size/", json=payload, timeout=self._request_timeout()) as response:
             if response.status >= 400:
                 text = await response.text()
                 print(f"Failed to update size {size_id}: {response.status} - {text}")
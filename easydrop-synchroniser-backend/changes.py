@@ -0,0 +1,35 @@
+"""
+Helpers for a single field change detected by the sync:
+{"field": "drop_price" | "nal" | "qty", "size_val": str | None, "old": ..., "new": ...}
+"""
+from typing import Any, Dict
+
+FIELD_PRICE = "drop_price"
+FIELD_NAL = "nal"
+FIELD_QTY = "qty"
+
+
+def make_change(field: str, old: Any, new: Any, size_val: str = None) -> Dict[str, Any]:
+    return {"field": field, "size_val": size_val, "old": old, "new": new}
+
+
+def from_record(record) -> Dict[str, Any]:
+    """Builds a change dict from a SyncChange row."""
+    return make_change(record.field, record.old_value, record.new_value, size_val=record.size_val)
+
+
+def format_change(change: Dict[str, Any]) -> str:
+    """Human-readable (Ukrainian) description, as shown in the history UI."""
+    field = change["field"]
+    if field == FIELD_PRICE:
+        return f"Ціна: {change['old']} -> {change['new']}"
+    if field == FIELD_NAL:
+        return f"Наявність: {change['old']} -> {change['new']}"
+    return f"Розмір {change['size_val']}: {change['old']} -> {change['new']}"
+
+
+def is_stock_out(change: Dict[str, Any]) -> bool:
+    """A size or the whole item went from available to zero."""
+    if change["field"] not in (FIELD_QTY, FIELD_NAL):
+        return False
+    return change["new"] == 0 and bool(change["old"])
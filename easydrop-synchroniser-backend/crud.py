@@ -1,9 +1,23 @@
+import json
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 import models_db, schemas
+from changes import FIELD_PRICE, FIELD_NAL, FIELD_QTY, is_stock_out
+
+ACTIVE_JOB_STATUSES = ("PENDING", "RUNNING")
+
+def now_local() -> datetime:
+    return datetime.now(ZoneInfo("Europe/Kyiv"))
 
 def get_mappings(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models_db.ProductMapping).offset(skip).limit(limit).all()
 
+def get_all_mappings(db: Session):
+    return db.query(models_db.ProductMapping).all()
+
 def create_mapping(db: Session, mapping: schemas.ProductMappingCreate):
     db_mapping = models_db.ProductMapping(**mapping.model_dump())
     db.add(db_mapping)
@@ -17,6 +31,9 @@ def update_mapping(db: Session, mapping_id: int, mapping: schemas.ProductMapping
         update_data = mapping.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_mapping, key, value)
+        # Re-pointed mappings must be re-read from the target on the next sync
+        if "source_id" in update_data or "target_id" in update_data:
+            delete_sync_state(db, mapping_id, commit=False)
         db.commit()
         db.refresh(db_mapping)
     return db_mapping
@@ -24,6 +41,7 @@ def update_mapping(db: Session, mapping_id: int, mapping: schemas.ProductMapping
 def delete_mapping(db: Session, mapping_id: int):
     db_mapping = db.query(models_db.ProductMapping).filter(models_db.ProductMapping.id == mapping_id).first()
     if db_mapping:
+        delete_sync_state(db, mapping_id, commit=False)
         db.delete(db_mapping)
         db.commit()
     return db_mapping
@@ -42,6 +60,259 @@ def set_setting(db: Session, key: str, value: str):
     db.refresh(db_setting)
     return db_setting
 
+# Sync State
+
+def get_sync_states(db: Session):
+    return {s.mapping_id: s for s in db.query(models_db.MappingSyncState).all()}
+
+def upsert_sync_state(db: Session, states: dict, mapping, drop_price, nal, sizes: dict, content_hash: str):
+    """Stages the last-pushed values for a mapping. Caller commits."""
+    db_state = states.get(mapping.id)
+    if not db_state:
+        db_state = models_db.MappingSyncState(mapping_id=mapping.id)
+        db.add(db_state)
+        states[mapping.id] = db_state
+    db_state.source_id = mapping.source_id
+    db_state.target_id = mapping.target_id
+    db_state.drop_price = drop_price
+    db_state.nal = nal
+    db_state.sizes = json.dumps(sizes, sort_keys=True)
+    db_state.content_hash = content_hash
+    return db_state
+
+def delete_sync_state(db: Session, mapping_id: int, commit: bool = True):
+    db.query(models_db.MappingSyncState).filter(models_db.MappingSyncState.mapping_id == mapping_id).delete()
+    if commit:
+        db.commit()
+
+# Sync Jobs
+
+def create_sync_job(db: Session, trigger: str, full_reconcile: bool = False, status: str = "PENDING", worker_id: str = None):
+    db_job = models_db.SyncJob(
+        trigger=trigger,
+        full_reconcile=full_reconcile,
+        status=status,
+        requested_at=now_local(),
+        worker_id=worker_id
+    )
+    if status == "RUNNING":
+        db_job.started_at = db_job.requested_at
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_sync_job(db: Session, job_id: int):
+    return db.query(models_db.SyncJob).filter(models_db.SyncJob.id == job_id).first()
+
+def get_active_sync_job(db: Session):
+    return db.query(models_db.SyncJob).filter(
+        models_db.SyncJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).order_by(models_db.SyncJob.id).first()
+
+def get_latest_sync_job(db: Session):
+    return db.query(models_db.SyncJob).order_by(models_db.SyncJob.id.desc()).first()
+
+def claim_sync_job(db: Session, worker_id: str):
+    """Atomically moves the oldest PENDING job to RUNNING. Returns None if another worker won."""
+    db_job = db.query(models_db.SyncJob).filter(
+        models_db.SyncJob.status == "PENDING"
+    ).order_by(models_db.SyncJob.id).first()
+    if not db_job:
+        return None
+    claimed = db.query(models_db.SyncJob).filter(
+        models_db.SyncJob.id == db_job.id,
+        models_db.SyncJob.status == "PENDING"
+    ).update(
+        {"status": "RUNNING", "worker_id": worker_id, "started_at": now_local()},
+        synchronize_session=False
+    )
+    db.commit()
+    if not claimed:
+        return None
+    db.refresh(db_job)
+    return db_job
+
+def finish_sync_job(db: Session, job: models_db.SyncJob, report: dict):
+    job.status = report.get("status", "FAILED")
+    job.error = report.get("error")
+    job.report = json.dumps(report)
+    job.finished_at = now_local()
+    db.commit()
+    return job
+
+def fail_stale_sync_jobs(db: Session, stale_before: datetime):
+    """Fails RUNNING jobs whose worker stopped sending heartbeats."""
+    alive = db.query(models_db.WorkerHeartbeat.worker_id).filter(
+        models_db.WorkerHeartbeat.last_seen >= stale_before
+    )
+    stale = db.query(models_db.SyncJob).filter(
+        models_db.SyncJob.status == "RUNNING",
+        ~models_db.SyncJob.worker_id.in_(alive)
+    ).all()
+    for db_job in stale:
+        db_job.status = "FAILED"
+        db_job.error = "Worker stopped responding"
+        db_job.finished_at = now_local()
+    db.commit()
+    return stale
+
+def fail_orphaned_sync_jobs(db: Session, worker_id: str, error: str):
+    """Fails RUNNING jobs of a worker that is not running anything (e.g. its result could not be stored)."""
+    orphaned = db.query(models_db.SyncJob).filter(
+        models_db.SyncJob.status == "RUNNING",
+        models_db.SyncJob.worker_id == worker_id
+    ).all()
+    for db_job in orphaned:
+        db_job.status = "FAILED"
+        db_job.error = db_job.error or error
+        db_job.finished_at = now_local()
+    db.commit()
+    return orphaned
+
+# Change Records
+
+def bulk_create_changes(db: Session, rows: list):
+    """Inserts change records in one executemany. Caller commits."""
+    if rows:
+        db.execute(insert(models_db.SyncChange), rows)
+
+def get_history(db: Session, limit: int = 50):
+    return db.query(models_db.SyncLog).order_by(models_db.SyncLog.started_at.desc()).limit(limit).all()
+
+def get_changes_for_logs(db: Session, log_ids: list):
+    changes = {}
+    if not log_ids:
+        return changes
+    rows = db.query(models_db.SyncChange).filter(
+        models_db.SyncChange.log_id.in_(log_ids)
+    ).order_by(models_db.SyncChange.id).all()
+    for row in rows:
+        changes.setdefault(row.log_id, []).append(row)
+    return changes
+
+def get_product_timeline(db: Session, target_id: int, field: str = None, size_val: str = None,
+                         new_value: int = None, limit: int = 100):
+    query = db.query(models_db.SyncChange).filter(models_db.SyncChange.target_id == target_id)
+    if field is not None:
+        query = query.filter(models_db.SyncChange.field == field)
+    if size_val is not None:
+        query = query.filter(models_db.SyncChange.size_val == size_val)
+    if new_value is not None:
+        query = query.filter(models_db.SyncChange.new_value == new_value)
+    return query.order_by(models_db.SyncChange.id.desc()).limit(limit).all()
+
+# Stats Rollups
+
+def record_run_stats(db: Session, day: date, report: dict, changed_mappings: list):
+    """
+    Adds one finished run to the per-day and per-mapping rollups. Uses
+    INSERT .. ON CONFLICT DO UPDATE with relative increments, so runs finishing
+    at the same time (scheduler thread and a manual run) both get counted.
+    """
+    duration = report.get("duration") or 0.0
+    day_row = {
+        "day": day,
+        "runs": 1,
+        "failed_runs": 1 if report.get("status") != "SUCCESS" else 0,
+        "changed_mappings": len(changed_mappings),
+        "changes": 0,
+        "price_changes": 0,
+        "nal_changes": 0,
+        "size_changes": 0,
+        "stock_outs": 0,
+        "total_duration": duration,
+        "max_duration": duration,
+    }
+    mapping_rows = []
+    for item in changed_mappings:
+        mapping, changes = item["mapping"], item["changes"]
+        price_changes = sum(1 for c in changes if c["field"] == FIELD_PRICE)
+        stock_outs = sum(1 for c in changes if is_stock_out(c))
+        day_row["changes"] += len(changes)
+        day_row["price_changes"] += price_changes
+        day_row["nal_changes"] += sum(1 for c in changes if c["field"] == FIELD_NAL)
+        day_row["size_changes"] += sum(1 for c in changes if c["field"] == FIELD_QTY)
+        day_row["stock_outs"] += stock_outs
+        mapping_rows.append({
+            "day": day,
+            "mapping_id": mapping.id,
+            "source_id": mapping.source_id,
+            "target_id": mapping.target_id,
+            "product_name": mapping.product_name,
+            "changes": len(changes),
+            "price_changes": price_changes,
+            "stock_outs": stock_outs,
+        })
+
+    daily = models_db.StatsDaily.__table__
+    stmt = sqlite_insert(daily).values(day_row)
+    counters = [key for key in day_row if key not in ("day", "max_duration")]
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[daily.c.day],
+        set_={
+            **{key: daily.c[key] + stmt.excluded[key] for key in counters},
+            "max_duration": func.max(daily.c.max_duration, stmt.excluded.max_duration),
+        }
+    ))
+
+    if mapping_rows:
+        per_mapping = models_db.StatsMappingDaily.__table__
+        stmt = sqlite_insert(per_mapping)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[per_mapping.c.day, per_mapping.c.mapping_id],
+            set_={
+                "source_id": stmt.excluded.source_id,
+                "target_id": stmt.excluded.target_id,
+                "product_name": stmt.excluded.product_name,
+                **{key: per_mapping.c[key] + stmt.excluded[key] for key in ("changes", "price_changes", "stock_outs")},
+            }
+        ), mapping_rows)
+    db.commit()
+
+def get_daily_stats(db: Session, date_from: date, date_to: date):
+    return db.query(models_db.StatsDaily).filter(
+        models_db.StatsDaily.day >= date_from,
+        models_db.StatsDaily.day <= date_to
+    ).order_by(models_db.StatsDaily.day).all()
+
+def get_most_volatile_mappings(db: Session, date_from: date, date_to: date, limit: int = 10):
+    row = models_db.StatsMappingDaily
+    return db.query(
+        row.mapping_id,
+        func.max(row.source_id).label("source_id"),
+        func.max(row.target_id).label("target_id"),
+        func.max(row.product_name).label("product_name"),
+        func.sum(row.changes).label("changes"),
+        func.sum(row.price_changes).label("price_changes"),
+        func.sum(row.stock_outs).label("stock_outs")
+    ).filter(
+        row.day >= date_from,
+        row.day <= date_to
+    ).group_by(row.mapping_id).order_by(func.sum(row.changes).desc()).limit(limit).all()
+
+# Worker Heartbeats
+
+def touch_heartbeat(db: Session, worker_id: str, hostname: str, pid: int, current_job_id: int = None):
+    db_heartbeat = db.query(models_db.WorkerHeartbeat).filter(models_db.WorkerHeartbeat.worker_id == worker_id).first()
+    now = now_local()
+    if not db_heartbeat:
+        db_heartbeat = models_db.WorkerHeartbeat(worker_id=worker_id, hostname=hostname, pid=pid, started_at=now)
+        db.add(db_heartbeat)
+    db_heartbeat.last_seen = now
+    db_heartbeat.current_job_id = current_job_id
+    db.commit()
+    return db_heartbeat
+
+def get_live_workers(db: Session, alive_after: datetime):
+    return db.query(models_db.WorkerHeartbeat).filter(
+        models_db.WorkerHeartbeat.last_seen >= alive_after
+    ).order_by(models_db.WorkerHeartbeat.worker_id).all()
+
+def delete_heartbeat(db: Session, worker_id: str):
+    db.query(models_db.WorkerHeartbeat).filter(models_db.WorkerHeartbeat.worker_id == worker_id).delete()
+    db.commit()
+
 # User Management
 
 def get_user_by_username(db: Session, username: str):
@@ -0,0 +1,300 @@
+"""
+In-process load test and latency regression check for the API.
+
+Seeds a throwaway SQLite database with configurable volumes, drives the
+FastAPI app concurrently over ASGI (no network, no uvicorn) and reports
+p50/p95/p99 latency and throughput per endpoint. Optionally runs synthetic
+syncs in a background thread at the same time, the way the embedded scheduler
+does, against a fake catalog instead of the Easydrop API.
+
+Requires httpx (requirements-dev.txt).
+
+    python loadtest.py --mappings 2000 --logs 100000 --users 20 --with-sync
+    python loadtest.py ... --update-baseline      # store results as the baseline
+    python loadtest.py ... --baseline loadtest_baseline.json --tolerance 0.25
+
+Exits with status 1 when an endpoint's p95 regresses beyond the tolerance.
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List
+
+# Configure the app before it is imported: separate DB, in-process sync
+_db_dir = tempfile.mkdtemp(prefix="easydrop-loadtest-")
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'loadtest.db')}"
+os.environ["EMBEDDED_SYNC"] = "true"
+os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+os.environ["SOURCE_API_KEY"] = "loadtest-source"
+os.environ["TARGET_API_KEY"] = "loadtest-target"
+
+import httpx
+from sqlalchemy import insert
+
+import main
+import models_db
+import crud
+import auth
+from database import SessionLocal
+
+USERNAME = "loadtest"
+PASSWORD = "loadtest"
+SIZE_VALUES = ["38", "39", "40", "41", "42", "43", "44"]
+
+
+class SyntheticCatalogClient:
+    """
+    Stands in for AsyncClient during synthetic syncs: serves a generated catalog
+    for the seeded mappings, drifts some prices/quantities on every fetch so each
+    run has work to do, and simulates network latency.
+    """
+
+    catalogs: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    latency = 0.02
+
+    def __init__(self, api_key: str, **kwargs):
+        self.api_key = api_key
+        self.stats = {"requests": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    @classmethod
+    def build(cls, source_ids: List[int], target_ids: List[int]):
+        for key, ids in (("loadtest-source", source_ids), ("loadtest-target", target_ids)):
+            items, sizes = [], []
+            for item_id in ids:
+                items.append({"id": item_id, "drop_price": 1000, "nal": 1})
+                for n, val in enumerate(SIZE_VALUES):
+                    sizes.append({"id": item_id * 10 + n, "item_id": item_id, "val": val, "qty": 5})
+            cls.catalogs[key] = {"items": items, "sizes": sizes}
+
+    async def _get(self, kind: str) -> List[Dict[str, Any]]:
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency)
+        rows = self.catalogs[self.api_key][kind]
+        if self.api_key == "loadtest-source":
+            for row in random.sample(rows, max(1, len(rows) // 50)):
+                if kind == "items":
+                    row["drop_price"] += random.choice((-10, 10))
+                else:
+                    row["qty"] = random.choice((0, 1, 3, 5, 8))
+        return [dict(row) for row in rows]
+
+    async def get_all_items(self):
+        return await self._get("items")
+
+    async def get_all_sizes(self):
+        return await self._get("sizes")
+
+    async def update_item_price(self, item_id: int, price: int, nal: int):
+        await asyncio.sleep(self.latency)
+
+    async def update_size_quantity(self, size_id: int, val: str, qty: int):
+        await asyncio.sleep(self.latency)
+
+
+def seed(mappings: int, logs: int):
+    """Fills the database with mappings, history (logs + change records) and an admin user."""
+    print(f"Seeding {mappings} mappings and {logs} sync logs into {os.environ['DATABASE_URL']}")
+    db = SessionLocal()
+    try:
+        crud.create_user(db, main.schemas.UserCreate(username=USERNAME, password=""), auth.get_password_hash(PASSWORD))
+        crud.set_setting(db, "sync_interval", "10")
+
+        source_ids = list(range(100_000, 100_000 + mappings))
+        target_ids = list(range(500_000, 500_000 + mappings))
+        db.execute(insert(models_db.ProductMapping), [
+            {"source_id": s_id, "target_id": t_id, "product_name": f"Product {n}"}
+            for n, (s_id, t_id) in enumerate(zip(source_ids, target_ids))
+        ])
+
+        now = crud.now_local()
+        batch = 10_000
+        for start in range(0, logs, batch):
+            count = min(batch, logs - start)
+            log_rows, change_rows = [], []
+            for n in range(start, start + count):
+                at = now - timedelta(minutes=10 * (logs - n))
+                idx = random.randrange(mappings) if mappings else 0
+                log_rows.append({
+                    "id": n + 1,
+                    "started_at": at,
+                    "completed_at": at + timedelta(seconds=5),
+                    "status": "SUCCESS",
+                    "product_name": f"Product {idx}",
+                    "source_id": source_ids[idx] if mappings else None,
+                    "target_id": target_ids[idx] if mappings else None,
+                })
+                change_rows.append({
+                    "log_id": n + 1,
+                    "mapping_id": idx + 1,
+                    "target_id": target_ids[idx] if mappings else 0,
+                    "field": "qty",
+                    "size_val": random.choice(SIZE_VALUES),
+                    "old_value": random.randint(1, 5),
+                    "new_value": 0,
+                    "changed_at": at,
+                })
+            db.execute(insert(models_db.SyncLog), log_rows)
+            db.execute(insert(models_db.SyncChange), change_rows)
+        db.commit()
+    finally:
+        db.close()
+
+    SyntheticCatalogClient.build(source_ids, target_ids)
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def drive(client: httpx.AsyncClient, name: str, request, total: int, users: int) -> Dict[str, Any]:
+    """Issues `total` requests from `users` concurrent callers and summarizes latency."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def user():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await request(client)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+async def run_load(args) -> Dict[str, Dict[str, Any]]:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        login = {"username": USERNAME, "password": PASSWORD}
+        response = await client.post("/token", data=login)
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        scenarios = {
+            "POST /token": (lambda c: c.post("/token", data=login), max(1, args.requests // 10)),
+            "GET /mappings": (lambda c: c.get("/mappings", params={"limit": 100}), args.requests),
+            "GET /history": (lambda c: c.get("/history", params={"limit": 50}), args.requests),
+            "GET /settings": (lambda c: c.get("/settings"), args.requests),
+            "POST /sync/run": (lambda c: c.post("/sync/run"), args.sync_requests),
+        }
+        results = {}
+        for name, (request, total) in scenarios.items():
+            if total <= 0:
+                continue
+            results[name] = await drive(client, name, request, total, args.users)
+            print(f"{name:<16} {json.dumps(results[name])}")
+        return results
+
+
+def background_syncs(stop: threading.Event, counter: Dict[str, int]):
+    """Back-to-back synthetic syncs, each in its own event loop like the scheduler thread."""
+    while not stop.is_set():
+        main.run_scheduled_sync()
+        counter["runs"] += 1
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> bool:
+    ok = True
+    print(f"\nAgainst baseline (p95 tolerance +{tolerance:.0%}):")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name:<16} no baseline")
+            continue
+        limit = base["p95_ms"] * (1 + tolerance)
+        regressed = current["p95_ms"] > limit
+        ok = ok and not regressed
+        print(
+            f"  {name:<16} p95 {current['p95_ms']}ms vs {base['p95_ms']}ms "
+            f"rps {current['rps']} vs {base['rps']} {'REGRESSED' if regressed else 'ok'}"
+        )
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mappings", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=10, help="Concurrent callers per endpoint")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per read endpoint")
+    parser.add_argument("--sync-requests", type=int, default=5, help="Requests to POST /sync/run")
+    parser.add_argument("--with-sync", action="store_true", help="Run synthetic syncs in the background")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated catalog API latency (s)")
+    parser.add_argument("--baseline", default="loadtest_baseline.json")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    random.seed(0)
+    SyntheticCatalogClient.latency = args.latency
+    main.sync_service.client_factory = SyntheticCatalogClient
+    main.sync_service.lookup_service = None
+    seed(args.mappings, args.logs)
+
+    stop = threading.Event()
+    counter = {"runs": 0}
+    syncer = None
+    if args.with_sync:
+        syncer = threading.Thread(target=background_syncs, args=(stop, counter), daemon=True)
+        syncer.start()
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        stop.set()
+        if syncer:
+            syncer.join()
+            print(f"Background syncs completed: {counter['runs']}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return 0 if compare(results, baseline, args.tolerance) else 1
+    print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
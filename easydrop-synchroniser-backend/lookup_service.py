@@ -0,0 +1,229 @@
+"""
+Batched, cached product lookup for the source and target stores.
+"""
+import os
+import asyncio
+import json
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+
+from async_client import AsyncClient
+import models_db
+from database import SessionLocal
+
+load_dotenv()
+
+SOURCE = "source"
+TARGET = "target"
+
+# Fields kept in catalog snapshots: enough to validate mappings and name products
+SNAPSHOT_ITEM_FIELDS = ("id", "brand", "model", "drop_price", "nal")
+SNAPSHOT_SIZE_FIELDS = ("id", "item_id", "val", "qty")
+
+
+class _CatalogCache:
+    """TTL cache of one store's items and sizes, keyed by item id."""
+
+    def __init__(self):
+        self.items: Dict[int, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self.sizes: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self.complete_at: Optional[float] = None  # When a full catalog was last loaded
+
+    def put(self, item_id: int, item: Optional[Dict[str, Any]], sizes: Dict[str, Dict[str, Any]], now: float):
+        self.items[item_id] = (now, item)
+        self.sizes[item_id] = sizes
+
+
+class ProductLookupService:
+    """
+    Resolves many source/target item IDs at once.
+
+    The cache is primed from the catalogs downloaded by each sync run. Syncs may
+    run in worker.py, so they also store a snapshot of each catalog in the
+    database, which the API process loads on a cache miss. Remaining misses are
+    fetched concurrently per ID, or, when there are many of them, with a single
+    full catalog download which is cheaper than hundreds of single-item requests.
+    """
+
+    def __init__(self, ttl_seconds: int = 600, concurrency_limit: int = 10, bulk_threshold: int = 50):
+        self.api_keys = {
+            SOURCE: os.getenv("SOURCE_API_KEY"),
+            TARGET: os.getenv("TARGET_API_KEY"),
+        }
+        self.ttl_seconds = ttl_seconds
+        self.concurrency_limit = concurrency_limit
+        self.bulk_threshold = bulk_threshold
+        self._caches = {SOURCE: _CatalogCache(), TARGET: _CatalogCache()}
+        self._snapshot_at = {SOURCE: 0.0, TARGET: 0.0}  # fetched_at of the newest snapshot seen
+        self._lock = threading.Lock()
+
+    def prime(
+        self, side: str, items_list: List[Dict[str, Any]], sizes_list: List[Dict[str, Any]], persist: bool = False
+    ):
+        """
+        Replaces the cache for `side` with a freshly downloaded full catalog.
+        With `persist`, also stores it as the shared snapshot for other processes.
+        """
+        self._install(side, items_list, sizes_list, time.monotonic())
+        if persist:
+            self._save_snapshot(side, items_list, sizes_list)
+
+    def _install(self, side: str, items_list: List[Dict[str, Any]], sizes_list: List[Dict[str, Any]], now: float):
+        sizes_by_item = self._group_sizes(sizes_list)
+        cache = _CatalogCache()
+        for item in items_list:
+            try:
+                item_id = int(item['id'])
+            except (KeyError, ValueError, TypeError):
+                continue
+            cache.put(item_id, item, sizes_by_item.get(item_id, {}), now)
+        cache.complete_at = now
+        with self._lock:
+            self._caches[side] = cache
+
+    async def resolve(
+        self, side: str, ids: Iterable[int]
+    ) -> Dict[int, Tuple[Optional[Dict[str, Any]], Dict[str, Dict[str, Any]]]]:
+        """
+        Returns {item_id: (item or None, {size_val: size})} for every requested ID.
+        A None item means the ID does not exist in that store.
+        """
+        wanted = set(ids)
+        found, misses = self._from_cache(side, wanted)
+        if misses and await asyncio.to_thread(self._load_snapshot, side):
+            more, misses = self._from_cache(side, misses)
+            found.update(more)
+        if misses:
+            if not self.api_keys[side]:
+                raise Exception("API Keys not found in environment.")
+            async with AsyncClient(self.api_keys[side], ssl=False) as client:
+                if len(misses) >= self.bulk_threshold:
+                    items_list, sizes_list = await asyncio.gather(
+                        client.get_all_items(),
+                        client.get_all_sizes()
+                    )
+                    self.prime(side, items_list, sizes_list)
+                else:
+                    await self._fetch_each(side, client, misses)
+            more, _ = self._from_cache(side, misses)
+            found.update(more)
+        return found
+
+    async def validate(self, pairs: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """
+        Checks (source_id, target_id) pairs: both items must exist and carry the
+        same set of size values.
+        """
+        sources, targets = await asyncio.gather(
+            self.resolve(SOURCE, {s_id for s_id, _ in pairs}),
+            self.resolve(TARGET, {t_id for _, t_id in pairs})
+        )
+        results = []
+        for s_id, t_id in pairs:
+            s_item, s_sizes = sources[s_id]
+            t_item, t_sizes = targets[t_id]
+            name_item = t_item or s_item
+            if not (s_item and t_item):
+                s_sizes = t_sizes = {}  # Size sets are only comparable when both items exist
+            results.append({
+                "source_id": s_id,
+                "target_id": t_id,
+                "source_found": s_item is not None,
+                "target_found": t_item is not None,
+                "product_name": self.product_name(name_item) if name_item else None,
+                "sizes_missing_in_target": sorted(set(s_sizes) - set(t_sizes)),
+                "sizes_missing_in_source": sorted(set(t_sizes) - set(s_sizes)),
+            })
+        return results
+
+    def _save_snapshot(self, side: str, items_list: List[Dict[str, Any]], sizes_list: List[Dict[str, Any]]):
+        fetched_at = time.time()
+        db = SessionLocal()
+        try:
+            db.merge(models_db.CatalogSnapshot(
+                side=side,
+                fetched_at=fetched_at,
+                items=json.dumps([{k: i.get(k) for k in SNAPSHOT_ITEM_FIELDS} for i in items_list]),
+                sizes=json.dumps([{k: s.get(k) for k in SNAPSHOT_SIZE_FIELDS} for s in sizes_list])
+            ))
+            db.commit()
+            self._snapshot_at[side] = fetched_at
+        except Exception as e:
+            # Sharing the cache is best-effort and must never break a sync
+            print(f"Failed to store {side} catalog snapshot: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _load_snapshot(self, side: str) -> bool:
+        """Loads the stored catalog when another process saved a newer one that is still fresh."""
+        db = SessionLocal()
+        try:
+            fetched_at = db.query(models_db.CatalogSnapshot.fetched_at).filter(
+                models_db.CatalogSnapshot.side == side
+            ).scalar()
+            age = time.time() - fetched_at if fetched_at else None
+            if age is None or fetched_at <= self._snapshot_at[side] or age >= self.ttl_seconds:
+                return False
+            snapshot = db.get(models_db.CatalogSnapshot, side)
+            items_list, sizes_list = json.loads(snapshot.items), json.loads(snapshot.sizes)
+        except Exception as e:
+            print(f"Failed to load {side} catalog snapshot: {e}")
+            return False
+        finally:
+            db.close()
+        self._install(side, items_list, sizes_list, time.monotonic() - age)
+        self._snapshot_at[side] = fetched_at
+        return True
+
+    def _from_cache(self, side: str, ids: Iterable[int]):
+        now = time.monotonic()
+        found, misses = {}, set()
+        with self._lock:
+            cache = self._caches[side]
+            catalog_fresh = cache.complete_at is not None and now - cache.complete_at < self.ttl_seconds
+            for item_id in ids:
+                entry = cache.items.get(item_id)
+                if entry and now - entry[0] < self.ttl_seconds:
+                    found[item_id] = (entry[1], cache.sizes.get(item_id, {}))
+                elif catalog_fresh and entry is None:
+                    # Absent from a fresh full catalog: known to be missing
+                    found[item_id] = (None, {})
+                else:
+                    misses.add(item_id)
+        return found, misses
+
+    async def _fetch_each(self, side: str, client: AsyncClient, ids: Iterable[int]):
+        sem = asyncio.Semaphore(self.concurrency_limit)
+
+        async def fetch_one(item_id: int):
+            async with sem:
+                items, sizes_list = await asyncio.gather(
+                    client.get_item(item_id),
+                    client.get_item_sizes(item_id)
+                )
+            item = next((i for i in items if int(i.get('id', -1)) == item_id), None)
+            sizes = self._group_sizes(sizes_list).get(item_id, {})
+            with self._lock:
+                self._caches[side].put(item_id, item, sizes, time.monotonic())
+
+        await asyncio.gather(*(fetch_one(item_id) for item_id in ids))
+
+    @staticmethod
+    def _group_sizes(sizes_list: List[Dict[str, Any]]) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        sizes_map = {}
+        for size in sizes_list:
+            try:
+                item_id = int(size.get('item_id'))
+            except (ValueError, TypeError):
+                continue
+            sizes_map.setdefault(item_id, {})[str(size.get('val'))] = size
+        return sizes_map
+
+    @staticmethod
+    def product_name(item: Dict[str, Any]) -> Optional[str]:
+        """Human-friendly name built from the item's brand and model."""
+        parts = [str(item.get(key)).strip() for key in ('brand', 'model') if item.get(key)]
+        return " ".join(parts) or None
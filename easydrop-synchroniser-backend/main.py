@@ -1,6 +1,8 @@
 import asyncio
 import os
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, status, Body, Header, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -8,30 +10,40 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from contextlib import asynccontextmanager
 import atexit
-from datetime import timedelta
+from datetime import date, timedelta
 
-import models_db, schemas, crud, auth
-from database import engine, get_db
-from sync_service import SyncService
+import models_db, schemas, crud, auth, sync_events, changes
+from database import engine, get_db, SessionLocal
+from sync_service import SyncService, DEFAULT_FULL_RECONCILE_INTERVAL
+from lookup_service import ProductLookupService
 
 # Create Tables
 models_db.Base.metadata.create_all(bind=engine)
 
+# With EMBEDDED_SYNC=false scheduling and execution belong to worker.py and
+# this process only enqueues jobs, so it can run with any number of workers.
+EMBEDDED_SYNC = os.getenv("EMBEDDED_SYNC", "true").lower() == "true"
+WORKER_ID = f"api-{os.getpid()}"
+
 scheduler = BackgroundScheduler()
-sync_service = SyncService()
+lookup_service = ProductLookupService()
+sync_service = SyncService(lookup_service=lookup_service)
 
 def run_scheduled_sync():
     """Wrapper to run sync with a fresh DB session"""
     print("Executing scheduled sync...")
     db = next(get_db())
     try:
+        job = crud.create_sync_job(db, trigger="scheduled", status="RUNNING", worker_id=WORKER_ID)
         # Run async method in a new event loop since this is a thread
-        asyncio.run(sync_service.run_synchronization(db))
+        asyncio.run(sync_service.run_job(db, job))
     finally:
         db.close()
 
 def reschedule_job(interval_minutes: int):
     """Updates the scheduler job with a new interval"""
+    if not EMBEDDED_SYNC:
+        return  # The worker re-reads sync_interval on every poll
     try:
         scheduler.remove_job('sync_job')
     except Exception:
@@ -51,17 +63,20 @@ async def lifespan(app: FastAPI):
     # Startup: Load settings and start scheduler
     db = next(get_db())
     try:
-        setting = crud.get_setting(db, "sync_interval")
-        interval = int(setting.value) if setting else 10 # Default 10 min
-        
-        print(f"Starting scheduler with interval: {interval} minutes")
-        scheduler.add_job(
-            run_scheduled_sync, 
-            IntervalTrigger(minutes=interval), 
-            id='sync_job',
-            replace_existing=True
-        )
-        scheduler.start()
+        if EMBEDDED_SYNC:
+            setting = crud.get_setting(db, "sync_interval")
+            interval = int(setting.value) if setting else 10 # Default 10 min
+            
+            print(f"Starting scheduler with interval: {interval} minutes")
+            scheduler.add_job(
+                run_scheduled_sync, 
+                IntervalTrigger(minutes=interval), 
+                id='sync_job',
+                replace_existing=True
+            )
+            scheduler.start()
+        else:
+            print("EMBEDDED_SYNC disabled: syncs are scheduled and run by worker.py")
         
         # Check and Create Admin User if not exists
         admin_username = os.getenv("ADMIN_USERNAME", "admin")
@@ -82,7 +97,8 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
-    scheduler.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -157,6 +173,43 @@ def create_mapping(
 ):
     return crud.create_mapping(db, mapping=mapping)
 
+@app.post("/mappings/validate", response_model=schemas.MappingValidationReport)
+async def validate_mappings(
+    request: schemas.MappingValidationRequest = Body(default_factory=schemas.MappingValidationRequest),
+    db: Session = Depends(get_db),
+    current_user: models_db.User = Depends(auth.get_current_user)
+):
+    """Check that mapped source/target IDs exist and have matching size sets"""
+    if request.pairs is not None:
+        stored = []
+        pairs = [(p.source_id, p.target_id) for p in request.pairs]
+    else:
+        stored = crud.get_all_mappings(db)
+        pairs = [(m.source_id, m.target_id) for m in stored]
+
+    try:
+        checked = await lookup_service.validate(pairs)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Product lookup failed: {e}")
+
+    results = [schemas.MappingValidationResult(**r) for r in checked]
+    names_filled = 0
+    for mapping, result in zip(stored, results):
+        result.mapping_id = mapping.id
+        if request.fill_names and not mapping.product_name and result.product_name:
+            mapping.product_name = result.product_name
+            names_filled += 1
+    if names_filled:
+        db.commit()
+
+    return schemas.MappingValidationReport(
+        results=results,
+        missing_source_ids=sorted({r.source_id for r in results if not r.source_found}),
+        missing_target_ids=sorted({r.target_id for r in results if not r.target_found}),
+        size_mismatches=sum(1 for r in results if r.sizes_missing_in_target or r.sizes_missing_in_source),
+        names_filled=names_filled
+    )
+
 @app.put("/mappings/{mapping_id}", response_model=schemas.ProductMapping)
 def update_mapping(
     mapping_id: int,
@@ -188,10 +241,17 @@ def get_settings(
     setting_interval = crud.get_setting(db, "sync_interval")
     interval = int(setting_interval.value) if setting_interval else 10
     
+    setting_reconcile = crud.get_setting(db, "full_reconcile_interval")
+    reconcile_interval = int(setting_reconcile.value) if setting_reconcile else DEFAULT_FULL_RECONCILE_INTERVAL
+
     setting_last_run = crud.get_setting(db, "last_sync_run")
     last_run = setting_last_run.value if setting_last_run else None
 
-    return schemas.SyncSettings(sync_interval=interval, last_sync_run=last_run)
+    return schemas.SyncSettings(
+        sync_interval=interval,
+        full_reconcile_interval=reconcile_interval,
+        last_sync_run=last_run
+    )
 
 @app.post("/settings", response_model=schemas.SyncSettings)
 def update_settings(
@@ -200,23 +260,121 @@ def update_settings(
     current_user: models_db.User = Depends(auth.get_current_user)
 ):
     crud.set_setting(db, "sync_interval", str(settings.sync_interval))
+    if settings.full_reconcile_interval is not None:
+        crud.set_setting(db, "full_reconcile_interval", str(settings.full_reconcile_interval))
     reschedule_job(settings.sync_interval)
     return settings
 
 @app.post("/sync/run")
 async def run_sync_manually(
+    full: bool = False,
     db: Session = Depends(get_db),
     current_user: models_db.User = Depends(auth.get_current_user)
 ):
-    """Manually trigger the sync process"""
-    await sync_service.run_synchronization(db)
+    """Manually trigger the sync process. Pass `full=true` to force a target reconciliation."""
+    if not EMBEDDED_SYNC:
+        job = crud.get_active_sync_job(db)
+        if job:
+            return {"message": "Synchronization is already queued or running", "job_id": job.id}
+        job = crud.create_sync_job(db, trigger="manual", full_reconcile=full)
+        return {"message": "Synchronization queued", "job_id": job.id}
+
+    job = crud.create_sync_job(db, trigger="manual", full_reconcile=full, status="RUNNING", worker_id=WORKER_ID)
+    await sync_service.run_job(db, job)
     
     # Reset the scheduler so the next auto-sync is relative to this manual run
     setting = crud.get_setting(db, "sync_interval")
     interval = int(setting.value) if setting else 10
     reschedule_job(interval)
     
-    return {"message": "Synchronization triggered successfully"}
+    return {"message": "Synchronization triggered successfully", "job_id": job.id}
+
+@app.get("/sync/status", response_model=schemas.SyncStatus)
+def get_sync_status(
+    db: Session = Depends(get_db),
+    current_user: models_db.User = Depends(auth.get_current_user)
+):
+    """Latest sync job and the workers currently reporting heartbeats"""
+    alive_after = crud.now_local() - timedelta(seconds=60)
+    return schemas.SyncStatus(
+        embedded=EMBEDDED_SYNC,
+        latest_job=crud.get_latest_sync_job(db),
+        workers=crud.get_live_workers(db, alive_after)
+    )
+
+def _sync_snapshot() -> str:
+    """Current job and schedule, sent first on every event stream connection"""
+    db = SessionLocal()
+    try:
+        job = crud.get_latest_sync_job(db)
+        setting_interval = crud.get_setting(db, "sync_interval")
+        setting_last_run = crud.get_setting(db, "last_sync_run")
+        return schemas.SyncSnapshot(
+            latest_job=job,
+            sync_interval=int(setting_interval.value) if setting_interval else 10,
+            last_sync_run=setting_last_run.value if setting_last_run else None
+        ).model_dump_json()
+    finally:
+        db.close()
+
+@app.post("/sync/events/token")
+def create_sync_events_token(current_user: models_db.User = Depends(auth.get_current_user)):
+    """Short-lived token for opening /sync/events, so the session token never lands in URLs or access logs"""
+    return {"token": auth.create_stream_token(current_user.username), "expires_in": auth.STREAM_TOKEN_EXPIRE_SECONDS}
+
+@app.get("/sync/events")
+async def stream_sync_events(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+    current_user: models_db.User = Depends(auth.get_current_user_from_query)
+):
+    """
+    Server-sent events for sync runs: run_started, phase, progress, change and
+    run_completed. Resumes after `last_event_id` (or the Last-Event-ID header
+    sent by a reconnecting EventSource); otherwise streams new events only.
+    """
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+
+    async def event_stream():
+        queue = sync_events.broker.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            snapshot = await asyncio.to_thread(_sync_snapshot)
+            yield f"event: snapshot\ndata: {snapshot}\n\n"
+
+            if resume_from is None:
+                sent = await asyncio.to_thread(sync_events.query_events, sync_events.get_last_event_id)
+            else:
+                sent = resume_from
+                while True:
+                    backlog = await asyncio.to_thread(sync_events.query_events, sync_events.get_events_after, sent)
+                    for event in backlog:
+                        yield sync_events.format_sse(event)
+                        sent = event.id
+                    if len(backlog) < 500:
+                        break
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break  # Fell behind; the client reconnects and replays from `sent`
+                if event.id <= sent:
+                    continue
+                yield sync_events.format_sse(event)
+                sent = event.id
+        finally:
+            sync_events.broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/history", response_model=list[schemas.SyncLog])
 def get_history(
@@ -225,7 +383,78 @@ def get_history(
     current_user: models_db.User = Depends(auth.get_current_user)
 ):
     """Fetch synchronization history"""
-    return db.query(models_db.SyncLog).order_by(models_db.SyncLog.started_at.desc()).limit(limit).all()
+    logs = crud.get_history(db, limit=limit)
+    changes_by_log = crud.get_changes_for_logs(db, [log.id for log in logs])
+
+    history = []
+    for log in logs:
+        records = [_change_record(row) for row in changes_by_log.get(log.id, [])]
+        entry = schemas.SyncLog.model_validate(log)
+        entry.changes = records
+        if records:
+            # Rows written before sync_changes existed keep their stored text
+            entry.details = "; ".join(r.text for r in records)
+        history.append(entry)
+    return history
+
+def _change_record(row: models_db.SyncChange) -> schemas.ChangeRecord:
+    record = schemas.ChangeRecord.model_validate(row)
+    record.text = changes.format_change(changes.from_record(row))
+    return record
+
+@app.get("/products/{target_id}/timeline", response_model=list[schemas.ChangeRecord])
+def get_product_timeline(
+    target_id: int,
+    field: Optional[str] = None,
+    size_val: Optional[str] = None,
+    new_value: Optional[int] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: models_db.User = Depends(auth.get_current_user)
+):
+    """
+    Change history of one target product, newest first. E.g. the last time
+    size 42 went to zero: ?field=qty&size_val=42&new_value=0&limit=1
+    """
+    rows = crud.get_product_timeline(
+        db, target_id, field=field, size_val=size_val, new_value=new_value, limit=limit
+    )
+    return [_change_record(row) for row in rows]
+
+@app.get("/stats", response_model=schemas.StatsReport)
+def get_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    top: int = 10,
+    db: Session = Depends(get_db),
+    current_user: models_db.User = Depends(auth.get_current_user)
+):
+    """Dashboard summary from the per-day rollups (defaults to the last 30 days)"""
+    date_to = date_to or crud.now_local().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+    days = crud.get_daily_stats(db, date_from, date_to)
+    runs = sum(d.runs for d in days)
+    failed_runs = sum(d.failed_runs for d in days)
+    totals = schemas.StatsTotals(
+        runs=runs,
+        failed_runs=failed_runs,
+        failure_rate=failed_runs / runs if runs else 0.0,
+        changes=sum(d.changes for d in days),
+        price_changes=sum(d.price_changes for d in days),
+        stock_outs=sum(d.stock_outs for d in days),
+        avg_duration=sum(d.total_duration for d in days) / runs if runs else 0.0,
+        max_duration=max((d.max_duration for d in days), default=0.0)
+    )
+    return schemas.StatsReport(
+        date_from=date_from,
+        date_to=date_to,
+        totals=totals,
+        days=days,
+        most_volatile=crud.get_most_volatile_mappings(db, date_from, date_to, limit=top)
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Float, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -35,3 +35,102 @@ class SyncLog(Base):
     source_id = Column(Integer, nullable=True)
     target_id = Column(Integer, nullable=True)
     details = Column(String, nullable=True)
+
+class MappingSyncState(Base):
+    __tablename__ = "mapping_sync_state"
+
+    mapping_id = Column(Integer, primary_key=True, index=True)
+    source_id = Column(Integer)
+    target_id = Column(Integer)
+    drop_price = Column(Integer, nullable=True)
+    nal = Column(Integer, nullable=True)
+    sizes = Column(String)  # JSON: {"size_val": {"id": size_id, "qty": qty}}
+    content_hash = Column(String)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trigger = Column(String)  # scheduled, manual
+    full_reconcile = Column(Boolean, default=False)
+    status = Column(String, index=True)  # PENDING, RUNNING, SUCCESS, FAILED
+    requested_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    report = Column(String, nullable=True)  # JSON run summary
+
+class WorkerHeartbeat(Base):
+    __tablename__ = "worker_heartbeats"
+
+    worker_id = Column(String, primary_key=True, index=True)
+    hostname = Column(String)
+    pid = Column(Integer)
+    started_at = Column(DateTime(timezone=True))
+    last_seen = Column(DateTime(timezone=True), index=True)
+    current_job_id = Column(Integer, nullable=True)
+
+class SyncEvent(Base):
+    __tablename__ = "sync_events"
+    # Ids must never be reused once pruning empties the table: clients resume by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)  # Doubles as the SSE event id
+    job_id = Column(Integer, index=True)
+    type = Column(String)  # run_started, phase, progress, change, run_completed
+    payload = Column(String)  # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class StatsDaily(Base):
+    __tablename__ = "stats_daily"
+
+    day = Column(Date, primary_key=True)
+    runs = Column(Integer, default=0)
+    failed_runs = Column(Integer, default=0)
+    changed_mappings = Column(Integer, default=0)
+    changes = Column(Integer, default=0)
+    price_changes = Column(Integer, default=0)
+    nal_changes = Column(Integer, default=0)
+    size_changes = Column(Integer, default=0)
+    stock_outs = Column(Integer, default=0)
+    total_duration = Column(Float, default=0.0)  # seconds
+    max_duration = Column(Float, default=0.0)
+
+class StatsMappingDaily(Base):
+    __tablename__ = "stats_mapping_daily"
+
+    day = Column(Date, primary_key=True)
+    mapping_id = Column(Integer, primary_key=True, index=True)
+    source_id = Column(Integer)
+    target_id = Column(Integer)
+    product_name = Column(String, nullable=True)
+    changes = Column(Integer, default=0)
+    price_changes = Column(Integer, default=0)
+    stock_outs = Column(Integer, default=0)
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        Index("ix_sync_changes_target_field", "target_id", "field", "size_val"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, nullable=True, index=True)
+    log_id = Column(Integer, index=True)  # sync_logs.id
+    mapping_id = Column(Integer)
+    target_id = Column(Integer)
+    field = Column(String)  # drop_price, nal, qty
+    size_val = Column(String, nullable=True)  # Only for qty
+    old_value = Column(Integer, nullable=True)
+    new_value = Column(Integer, nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CatalogSnapshot(Base):
+    __tablename__ = "catalog_snapshots"
+
+    side = Column(String, primary_key=True)  # source, target
+    fetched_at = Column(Float)  # Unix time the catalog was downloaded
+    items = Column(String)  # JSON list, lookup fields only
+    sizes = Column(String)  # JSON list, lookup fields only
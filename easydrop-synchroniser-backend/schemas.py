@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 
 class ProductMappingBase(BaseModel):
     source_id: int
@@ -22,8 +22,34 @@ class ProductMapping(ProductMappingBase):
     class Config:
         from_attributes = True
 
+class MappingPair(BaseModel):
+    source_id: int
+    target_id: int
+
+class MappingValidationRequest(BaseModel):
+    pairs: Optional[List[MappingPair]] = None  # Defaults to all stored mappings
+    fill_names: bool = False  # Auto-fill empty product_name on stored mappings
+
+class MappingValidationResult(BaseModel):
+    mapping_id: Optional[int] = None
+    source_id: int
+    target_id: int
+    source_found: bool
+    target_found: bool
+    product_name: Optional[str] = None
+    sizes_missing_in_target: List[str] = []
+    sizes_missing_in_source: List[str] = []
+
+class MappingValidationReport(BaseModel):
+    results: List[MappingValidationResult]
+    missing_source_ids: List[int]
+    missing_target_ids: List[int]
+    size_mismatches: int
+    names_filled: int = 0
+
 class SyncSettings(BaseModel):
     sync_interval: int
+    full_reconcile_interval: Optional[int] = None
     last_sync_run: Optional[datetime] = None
 
     class Config:
@@ -45,6 +71,22 @@ class PasswordChange(BaseModel):
     old_password: str
     new_password: str
 
+class ChangeRecord(BaseModel):
+    id: int
+    job_id: Optional[int] = None
+    log_id: Optional[int] = None
+    mapping_id: Optional[int] = None
+    target_id: int
+    field: str
+    size_val: Optional[str] = None
+    old_value: Optional[int] = None
+    new_value: Optional[int] = None
+    changed_at: Optional[datetime] = None
+    text: Optional[str] = None  # Rendered at read time
+
+    class Config:
+        from_attributes = True
+
 class SyncLog(BaseModel):
     id: int
     started_at: datetime
@@ -54,6 +96,88 @@ class SyncLog(BaseModel):
     source_id: Optional[int] = None
     target_id: Optional[int] = None
     details: Optional[str] = None
+    changes: List[ChangeRecord] = []
+
+    class Config:
+        from_attributes = True
+
+class SyncJob(BaseModel):
+    id: int
+    trigger: str
+    full_reconcile: bool = False
+    status: str
+    requested_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    error: Optional[str] = None
+    report: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+class WorkerHeartbeat(BaseModel):
+    worker_id: str
+    hostname: Optional[str] = None
+    pid: Optional[int] = None
+    started_at: Optional[datetime] = None
+    last_seen: datetime
+    current_job_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class SyncStatus(BaseModel):
+    embedded: bool
+    latest_job: Optional[SyncJob] = None
+    workers: List[WorkerHeartbeat] = []
+
+class SyncSnapshot(BaseModel):
+    latest_job: Optional[SyncJob] = None
+    sync_interval: int
+    last_sync_run: Optional[datetime] = None
+
+class StatsDay(BaseModel):
+    day: date
+    runs: int
+    failed_runs: int
+    changed_mappings: int
+    changes: int
+    price_changes: int
+    nal_changes: int
+    size_changes: int
+    stock_outs: int
+    total_duration: float
+    max_duration: float
+
+    class Config:
+        from_attributes = True
+
+class StatsMapping(BaseModel):
+    mapping_id: int
+    source_id: Optional[int] = None
+    target_id: Optional[int] = None
+    product_name: Optional[str] = None
+    changes: int
+    price_changes: int
+    stock_outs: int
+
+    class Config:
+        from_attributes = True
+
+class StatsTotals(BaseModel):
+    runs: int = 0
+    failed_runs: int = 0
+    failure_rate: float = 0.0
+    changes: int = 0
+    price_changes: int = 0
+    stock_outs: int = 0
+    avg_duration: float = 0.0
+    max_duration: float = 0.0
+
+class StatsReport(BaseModel):
+    date_from: date
+    date_to: date
+    totals: StatsTotals
+    days: List[StatsDay]
+    most_volatile: List[StatsMapping]
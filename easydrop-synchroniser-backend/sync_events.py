@@ -0,0 +1,191 @@
+"""
+Sync progress events.
+
+Runs publish events (run start, phase changes, progress counts, per-mapping
+changes, completion) into the `sync_events` table, which gives every event a
+monotonically increasing id that clients use to resume. Inside the API process
+a single SyncEventBroker tails that table and fans events out to all connected
+SSE clients, so open History tabs cost one cheap indexed query per poll in
+total instead of authenticated history/settings queries per tab.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from typing import List, Optional, Set
+
+import crud
+import models_db
+from database import SessionLocal
+
+EVENT_RETENTION = timedelta(days=1)
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+def format_sse(event: models_db.SyncEvent) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.payload}\n\n"
+
+
+def get_events_after(db, last_id: int, limit: int = 500) -> List[models_db.SyncEvent]:
+    return db.query(models_db.SyncEvent).filter(
+        models_db.SyncEvent.id > last_id
+    ).order_by(models_db.SyncEvent.id).limit(limit).all()
+
+
+def get_last_event_id(db) -> int:
+    event = db.query(models_db.SyncEvent).order_by(models_db.SyncEvent.id.desc()).first()
+    return event.id if event else 0
+
+
+def query_events(fn, *args):
+    """Runs an event query in a short-lived session and detaches the results."""
+    db = SessionLocal()
+    try:
+        result = fn(db, *args)
+        if isinstance(result, list):
+            for event in result:
+                db.expunge(event)
+        return result
+    finally:
+        db.close()
+
+
+class SyncEventPublisher:
+    """
+    Writes events for one sync job. Uses its own session so event commits never
+    touch the sync's own transaction (which is rolled back on failure).
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._last_progress = 0.0
+
+    def emit(self, event_type: str, **payload):
+        self.emit_many(event_type, [payload])
+
+    def emit_many(self, event_type: str, payloads: List[dict]):
+        """Writes several events of one type in a single commit."""
+        if not payloads:
+            return
+        now = crud.now_local()
+        db = SessionLocal()
+        try:
+            db.add_all([
+                models_db.SyncEvent(
+                    job_id=self.job_id,
+                    type=event_type,
+                    payload=json.dumps({**payload, "job_id": self.job_id}, ensure_ascii=False, default=str),
+                    created_at=now
+                )
+                for payload in payloads
+            ])
+            db.commit()
+        except Exception as e:
+            # Progress reporting must never break a sync
+            print(f"Failed to publish sync event {event_type}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        broker.notify()
+
+    def progress(self, done: int, total: int):
+        """Throttled progress counter; always emits the final count."""
+        now = time.monotonic()
+        if done < total and now - self._last_progress < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_progress = now
+        self.emit("progress", done=done, total=total)
+
+    def prune(self):
+        """
+        Drops events older than EVENT_RETENTION; called once per run. Always keeps
+        the newest event, so tables created before AUTOINCREMENT was enabled never
+        become empty and restart ids at 1.
+        """
+        db = SessionLocal()
+        try:
+            db.query(models_db.SyncEvent).filter(
+                models_db.SyncEvent.created_at < crud.now_local() - EVENT_RETENTION,
+                models_db.SyncEvent.id < get_last_event_id(db)
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            print(f"Failed to prune sync events: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+class SyncEventBroker:
+    """
+    Fans sync events out to subscribers of this process. One tail task polls the
+    events table while anyone is subscribed; publishers in the same process
+    wake it immediately, events from worker.py are picked up on the next poll.
+    """
+
+    def __init__(self, poll_seconds: float = 1.0):
+        self.poll_seconds = poll_seconds
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            with self._lock:
+                self._loop = asyncio.get_running_loop()
+                self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._tail())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def notify(self):
+        """Thread-safe wake-up; a no-op when nothing in this process is listening."""
+        with self._lock:
+            loop, wake = self._loop, self._wake
+        if loop and wake and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _tail(self):
+        last_id = None
+        while self._subscribers:
+            self._wake.clear()
+            events = []
+            try:
+                if last_id is None:
+                    last_id = await asyncio.to_thread(query_events, get_last_event_id)
+                events = await asyncio.to_thread(query_events, get_events_after, last_id)
+            except Exception as e:
+                # E.g. "database is locked" while the worker commits; the next poll catches up
+                print(f"Failed to poll sync events: {e}")
+            for event in events:
+                last_id = event.id
+                for queue in list(self._subscribers):
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        self._overflow(queue)
+            if len(events) < 500:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        with self._lock:
+            self._loop = self._wake = None
+
+    @staticmethod
+    def _overflow(queue: asyncio.Queue):
+        """Replaces a stuck client's backlog with None: the stream closes and the
+        client reconnects with its Last-Event-ID to replay from the table."""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+broker = SyncEventBroker()
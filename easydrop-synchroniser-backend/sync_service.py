@@ -1,85 +1,205 @@
 import os
 import asyncio
+import functools
+import hashlib
+import json
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
 from async_client import AsyncClient
+from lookup_service import ProductLookupService, SOURCE, TARGET
+from sync_events import SyncEventPublisher
+from write_scheduler import PriorityWriteScheduler, item_priority, size_priority
 import models_db
 import crud
+from database import SessionLocal
+from changes import FIELD_PRICE, FIELD_NAL, FIELD_QTY, make_change, format_change
 
 # Load env variables
 load_dotenv()
 
+DEFAULT_FULL_RECONCILE_INTERVAL = 360  # minutes
+# content_hash of the state recorded for a mapping whose source or target item
+# was missing at the last full reconciliation; incremental runs skip it
+MISSING_STATE_HASH = "missing"
+
 class SyncService:
-    def __init__(self):
+    def __init__(self, lookup_service: Optional[ProductLookupService] = None, client_factory=AsyncClient):
         self.source_api_key = os.getenv("SOURCE_API_KEY")
         self.target_api_key = os.getenv("TARGET_API_KEY")
         self.concurrency_limit = 20  # Limit parallel updates to avoid overwhelming the API
+        self.lookup_service = lookup_service  # Primed with every catalog this service downloads
+        self.client_factory = client_factory  # Swapped for a synthetic catalog by loadtest.py
+        # Total time budget for one run; a stalled request can no longer hang the scheduler
+        self.deadline_seconds = float(os.getenv("SYNC_DEADLINE_SECONDS", 600))
+        self.connect_timeout = float(os.getenv("SYNC_CONNECT_TIMEOUT", 10))
+        self.read_timeout = float(os.getenv("SYNC_READ_TIMEOUT", 60))
+        self.hedge_reads = os.getenv("SYNC_HEDGE_READS", "false").lower() == "true"
 
-    async def run_synchronization(self, db: Session):
+    async def run_job(self, db: Session, job: models_db.SyncJob) -> Dict[str, Any]:
+        """Runs a claimed (RUNNING) SyncJob, streaming its progress as sync events, and stores its report."""
+        events = SyncEventPublisher(job.id)
+        try:
+            events.prune()
+            events.emit("run_started", trigger=job.trigger, full_reconcile=bool(job.full_reconcile), started_at=job.started_at)
+            report = await self.run_synchronization(
+                db, full_reconcile=bool(job.full_reconcile), events=events, job_id=job.id
+            )
+            crud.finish_sync_job(db, job, report)
+        except Exception as e:
+            # A job left RUNNING blocks every later run, so it must end up FAILED
+            print(f"Sync job {job.id} failed: {e}")
+            db.rollback()
+            report = {"status": "FAILED", "error": str(e)}
+            await self._fail_job(job.id, report)
+        events.emit("run_completed", **report)
+        return report
+
+    @staticmethod
+    async def _fail_job(job_id: int, report: Dict[str, Any], attempts: int = 3):
+        """Marks a job FAILED in a fresh session, retrying while the database is locked."""
+        for attempt in range(1, attempts + 1):
+            db = SessionLocal()
+            try:
+                crud.finish_sync_job(db, crud.get_sync_job(db, job_id), report)
+                return
+            except Exception as e:
+                print(f"Failed to mark sync job {job_id} as FAILED (attempt {attempt}): {e}")
+                db.rollback()
+            finally:
+                db.close()
+            await asyncio.sleep(attempt)
+
+    async def run_synchronization(
+        self,
+        db: Session,
+        full_reconcile: bool = False,
+        events: Optional[SyncEventPublisher] = None,
+        job_id: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
-        Main async synchronization logic.
+        Main async synchronization logic. Returns a run report.
+
+        Normal runs diff the source against the last values pushed to the target
+        (stored per mapping in MappingSyncState) and never read the target catalog.
+        A full reconciliation pass re-reads the target to pick up manual edits; it
+        runs when forced, when `full_reconcile_interval` minutes have passed since
+        the last one, or when some mapping has never been checked yet. Mappings
+        whose source or target item was missing at the last full pass are skipped
+        by normal runs until the next one.
         """
         print("--- Starting High-Performance Async Synchronization ---")
         start_time = time.time()
         ukraine_tz = ZoneInfo("Europe/Kyiv")
         db_start_time = datetime.now(ukraine_tz)
 
-        # Record last sync run time
-        crud.set_setting(db, "last_sync_run", db_start_time.isoformat())
-        
         # Track which mappings actually had changes
         changed_mappings = []
+        clients: Dict[str, AsyncClient] = {}
+        deadline: Optional[float] = None
+        report = {"status": "SUCCESS", "error": None, "full_reconcile": full_reconcile, "mappings": 0, "changed_mappings": 0, "updates": 0}
 
         try:
+            # Record last sync run time
+            crud.set_setting(db, "last_sync_run", db_start_time.isoformat())
+
             if not self.source_api_key or not self.target_api_key:
                 raise Exception("API Keys not found in environment.")
 
-            # 1. Fetch Mappings
+            # 1. Fetch Mappings and last-synced state
             mappings = db.query(models_db.ProductMapping).all()
             if not mappings:
                 print("No mappings found. Exiting.")
-                return
+                return report
 
-            # 2. Bulk Fetch Data
-            async with AsyncClient(self.source_api_key, ssl=False) as source_client, \
-                       AsyncClient(self.target_api_key, ssl=False) as target_client:
-                
-                # Fetch everything in parallel
-                results = await asyncio.gather(
-                    source_client.get_all_items(),
-                    target_client.get_all_items(),
-                    source_client.get_all_sizes(),
-                    target_client.get_all_sizes()
+            states = crud.get_sync_states(db)
+            if not full_reconcile:
+                full_reconcile = self._full_reconcile_due(db, db_start_time) or any(
+                    not self._state_matches(states.get(m.id), m) for m in mappings
                 )
+            report["mappings"] = len(mappings)
+            report["full_reconcile"] = full_reconcile
+
+            # 2. Bulk Fetch Data
+            deadline = asyncio.get_running_loop().time() + self.deadline_seconds
+            clients = {
+                SOURCE: self._make_client(self.source_api_key, deadline, SOURCE),
+                TARGET: self._make_client(self.target_api_key, deadline, TARGET),
+            }
+            async with asyncio.timeout_at(deadline), \
+                       clients[SOURCE] as source_client, \
+                       clients[TARGET] as target_client:
                 
-                source_items_list, target_items_list, source_sizes_list, target_sizes_list = results
+                if events:
+                    events.emit("phase", phase="fetching", full_reconcile=full_reconcile)
+                if full_reconcile:
+                    print("Full reconciliation: reading target catalog.")
+                    # Fetch everything in parallel
+                    results = await asyncio.gather(
+                        source_client.get_all_items(),
+                        target_client.get_all_items(),
+                        source_client.get_all_sizes(),
+                        target_client.get_all_sizes()
+                    )
+                    source_items_list, target_items_list, source_sizes_list, target_sizes_list = results
+                else:
+                    source_items_list, source_sizes_list = await asyncio.gather(
+                        source_client.get_all_items(),
+                        source_client.get_all_sizes()
+                    )
+
+                if self.lookup_service:
+                    self.lookup_service.prime(SOURCE, source_items_list, source_sizes_list, persist=True)
+                    if full_reconcile:
+                        self.lookup_service.prime(TARGET, target_items_list, target_sizes_list, persist=True)
 
                 # 3. Data Transformation
                 source_items_map = {int(item['id']): item for item in source_items_list}
-                target_items_map = {int(item['id']): item for item in target_items_list}
                 source_sizes_map = self._build_sizes_map(source_sizes_list)
-                target_sizes_map = self._build_sizes_map(target_sizes_list)
+                if full_reconcile:
+                    target_items_map = {int(item['id']): item for item in target_items_list}
+                    target_sizes_map = self._build_sizes_map(target_sizes_list)
 
                 # 4. Compare logic
-                item_update_tasks = []
-                size_update_tasks = []
-                sem = asyncio.Semaphore(self.concurrency_limit)
+                if events:
+                    events.emit("phase", phase="comparing", mappings=len(mappings))
+                progress = {"done": 0, "total": 0}
+
+                def on_update_done():
+                    progress["done"] += 1
+                    if events:
+                        events.progress(progress["done"], progress["total"])
+
+                writes = PriorityWriteScheduler(self.concurrency_limit, on_done=on_update_done)
+                item_updates = size_updates = 0
+                staged_states = []  # (mapping, values once writes are applied, values read from the target)
                 
                 for mapping in mappings:
                     s_id = mapping.source_id
                     t_id = mapping.target_id
                     mapping_has_changes = False
-                    mapping_changes_details = []
+                    mapping_changes = []
 
                     s_item = source_items_map.get(s_id)
-                    t_item = target_items_map.get(t_id)
+                    state = states.get(mapping.id)
+                    if full_reconcile:
+                        t_item = target_items_map.get(t_id)
+                        t_item_sizes = target_sizes_map.get(t_id, {})
+                    elif state.content_hash == MISSING_STATE_HASH:
+                        continue
+                    else:
+                        t_item, t_item_sizes = self._target_from_state(state)
 
                     if not s_item or not t_item:
+                        if full_reconcile and (
+                            not self._state_matches(state, mapping) or state.content_hash != MISSING_STATE_HASH
+                        ):
+                            # Mark as checked so it does not force a full pass on every run
+                            crud.upsert_sync_state(db, states, mapping, None, None, {}, MISSING_STATE_HASH)
                         continue
 
                     # Compare Item Level
@@ -89,44 +209,97 @@ class SyncService:
                     t_nal = t_item.get('nal')
 
                     if s_price != t_price or s_nal != t_nal:
-                        item_update_tasks.append(self._bounded_update_item(sem, target_client, t_id, s_price, s_nal))
+                        writes.submit(
+                            item_priority(t_nal, s_nal),
+                            functools.partial(target_client.update_item_price, t_id, s_price, s_nal),
+                            key=mapping.id
+                        )
+                        item_updates += 1
                         mapping_has_changes = True
                         if s_price != t_price:
-                            mapping_changes_details.append(f"Ціна: {t_price} -> {s_price}")
+                            mapping_changes.append(make_change(FIELD_PRICE, t_price, s_price))
                         if s_nal != t_nal:
-                            mapping_changes_details.append(f"Наявність: {t_nal} -> {s_nal}")
+                            mapping_changes.append(make_change(FIELD_NAL, t_nal, s_nal))
 
                     # Compare Size Level
                     s_item_sizes = source_sizes_map.get(s_id, {})
-                    t_item_sizes = target_sizes_map.get(t_id, {})
+                    pushed_sizes = {}
 
                     for val, t_size_data in t_item_sizes.items():
+                        pushed_qty = t_size_data['qty']
                         if val in s_item_sizes:
                             s_qty = s_item_sizes[val]['qty']
                             if t_size_data['qty'] != s_qty:
-                                size_update_tasks.append(self._bounded_update_size(sem, target_client, t_size_data['id'], val, s_qty))
+                                writes.submit(
+                                    size_priority(t_size_data['qty'], s_qty),
+                                    functools.partial(target_client.update_size_quantity, t_size_data['id'], val, s_qty),
+                                    key=mapping.id
+                                )
+                                size_updates += 1
                                 mapping_has_changes = True
-                                mapping_changes_details.append(f"Розмір {val}: {t_size_data['qty']} -> {s_qty}")
+                                mapping_changes.append(make_change(FIELD_QTY, t_size_data['qty'], s_qty, size_val=val))
+                            pushed_qty = s_qty
+                        pushed_sizes[val] = {"id": t_size_data['id'], "qty": pushed_qty}
+
+                    # Stage the values the target will hold once updates are applied
+                    content_hash = self._state_hash(s_price, s_nal, pushed_sizes)
+                    if not self._state_matches(state, mapping) or state.content_hash != content_hash:
+                        current = None
+                        if not self._state_matches(state, mapping):
+                            current_sizes = {val: {"id": d['id'], "qty": d['qty']} for val, d in t_item_sizes.items()}
+                            current = (t_price, t_nal, current_sizes, self._state_hash(t_price, t_nal, current_sizes))
+                        staged_states.append((mapping, (s_price, s_nal, pushed_sizes, content_hash), current))
 
                     if mapping_has_changes:
                         changed_mappings.append({
                             "mapping": mapping,
-                            "details": "; ".join(mapping_changes_details)
+                            "changes": mapping_changes,
+                            "details": "; ".join(format_change(c) for c in mapping_changes)
                         })
 
-                # 5. Execute Updates Sequentially (Items first, then Sizes)
-                total_updates = len(item_update_tasks) + len(size_update_tasks)
+                # 5. Execute Updates, most urgent first (stock-outs, then decreases, then the rest)
+                total_updates = item_updates + size_updates
+                report["updates"] = total_updates
+                progress["total"] = total_updates
+                failed = {}
                 if total_updates > 0:
-                    print(f"Executing {total_updates} updates (Items: {len(item_update_tasks)}, Sizes: {len(size_update_tasks)})...")
-                    
-                    if item_update_tasks:
-                        await asyncio.gather(*item_update_tasks)
-                    
-                    if size_update_tasks:
-                        await asyncio.gather(*size_update_tasks)
-                    
-                    # Log each changed mapping
+                    print(f"Executing {total_updates} updates (Items: {item_updates}, Sizes: {size_updates})...")
+                    if events:
+                        events.emit("phase", phase="applying", total=total_updates)
+
+                    try:
+                        failed = await writes.run()
+                    finally:
+                        report["write_priorities"] = writes.report()
+                    if failed:
+                        report.update(
+                            status="PARTIAL",
+                            error=f"Updates failed for {len(failed)} of {len(changed_mappings)} changed mappings: "
+                                  f"{next(iter(failed.values()))}"
+                        )
+                        print(f"Synchronization partially failed: {report['error']}")
+                    for name, timing in report["write_priorities"].items():
+                        print(f"  {name}: {timing['count']} applied, max time-to-apply {timing['max_seconds']}s")
+
+                    # A mapping only counts as synced when all of its writes went through;
+                    # failed ones keep their old state, so the next run diffs and retries them
+                    failed_mappings = [item for item in changed_mappings if item["mapping"].id in failed]
+                    changed_mappings = [item for item in changed_mappings if item["mapping"].id not in failed]
+
+                    # Log each changed mapping; details text is rendered from sync_changes at read time
                     db_end_time = datetime.now(ukraine_tz)
+                    for item in failed_mappings:
+                        m = item["mapping"]
+                        db.add(models_db.SyncLog(
+                            started_at=db_start_time,
+                            completed_at=db_end_time,
+                            status="FAILED",
+                            product_name=m.product_name,
+                            source_id=m.source_id,
+                            target_id=m.target_id,
+                            details=f"Помилка оновлення: {failed[m.id]}"
+                        ))
+                    new_logs = []
                     for item in changed_mappings:
                         m = item["mapping"]
                         new_log = models_db.SyncLog(
@@ -135,20 +308,126 @@ class SyncService:
                             status="SUCCESS",
                             product_name=m.product_name,
                             source_id=m.source_id,
-                            target_id=m.target_id,
-                            details=item["details"]
+                            target_id=m.target_id
                         )
                         db.add(new_log)
-                    db.commit()
+                        new_logs.append(new_log)
+                    db.flush()  # Assigns log ids for the change records
+
+                    change_rows = []
+                    for new_log, item in zip(new_logs, changed_mappings):
+                        for change in item["changes"]:
+                            change_rows.append({
+                                "job_id": job_id,
+                                "log_id": new_log.id,
+                                "mapping_id": item["mapping"].id,
+                                "target_id": new_log.target_id,
+                                "field": change["field"],
+                                "size_val": change["size_val"],
+                                "old_value": change["old"],
+                                "new_value": change["new"],
+                                "changed_at": db_end_time
+                            })
+                    crud.bulk_create_changes(db, change_rows)
                 else:
                     print("Sync complete. No changes detected.")
 
+                # Persist pushed state only for mappings whose writes all went through. A failed
+                # mapping without usable state gets what the target held, so it does not force
+                # a full pass on every run and the next run retries its writes.
+                for mapping, pushed, current in staged_states:
+                    values = pushed if mapping.id not in failed else current
+                    if values:
+                        crud.upsert_sync_state(db, states, mapping, *values)
+                report["changed_mappings"] = len(changed_mappings)
+                if full_reconcile:
+                    crud.set_setting(db, "last_full_reconcile", db_start_time.isoformat())
+                db.commit()
+
+                # Published after commit: the event writer uses its own connection
+                if events:
+                    events.emit_many("change", [
+                        {
+                            "mapping_id": item["mapping"].id,
+                            "product_name": item["mapping"].product_name,
+                            "source_id": item["mapping"].source_id,
+                            "target_id": item["mapping"].target_id,
+                            "details": item["details"],
+                            "changes": item["changes"]
+                        }
+                        for item in changed_mappings
+                    ])
+
+        except TimeoutError as e:
+            # aiohttp's per-request sock_read/sock_connect timeouts are TimeoutErrors too
+            if deadline is not None and asyncio.get_running_loop().time() >= deadline:
+                error = f"Deadline of {self.deadline_seconds:.0f}s exceeded"
+            else:
+                error = f"Request timed out: {type(e).__name__}: {e}"
+            report.update(status="FAILED", error=error)
+            print(f"Synchronization failed: {report['error']}")
+            db.rollback()
         except Exception as e:
+            report.update(status="FAILED", error=str(e))
             print(f"Synchronization failed: {e}")
             # Optional: Log the overall failure if needed, but per-product logging is preferred
             db.rollback()
         finally:
-            print(f"--- Synchronization Finished in {time.time() - start_time:.2f} seconds ---")
+            report["duration"] = round(time.time() - start_time, 3)
+            if clients:
+                report["client_stats"] = {side: client.stats for side, client in clients.items()}
+                print(f"Client stats: {report['client_stats']}")
+            print(f"--- Synchronization Finished in {report['duration']:.2f} seconds ---")
+
+        # Rollups only count changes that were actually applied
+        applied = changed_mappings if report["status"] != "FAILED" else []
+        try:
+            crud.record_run_stats(db, db_start_time.date(), report, applied)
+        except Exception as e:
+            print(f"Failed to update stats rollups: {e}")
+            db.rollback()
+
+        return report
+
+    def _make_client(self, api_key: str, deadline: float, label: str) -> AsyncClient:
+        return self.client_factory(
+            api_key,
+            ssl=False,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            deadline=deadline,
+            hedge=self.hedge_reads,
+            label=label
+        )
+
+    def _full_reconcile_due(self, db: Session, now: datetime) -> bool:
+        """True when the last full reconciliation is older than `full_reconcile_interval` minutes."""
+        setting_interval = crud.get_setting(db, "full_reconcile_interval")
+        interval = int(setting_interval.value) if setting_interval else DEFAULT_FULL_RECONCILE_INTERVAL
+        setting_last = crud.get_setting(db, "last_full_reconcile")
+        if not setting_last:
+            return True
+        return now - datetime.fromisoformat(setting_last.value) >= timedelta(minutes=interval)
+
+    @staticmethod
+    def _state_matches(state, mapping) -> bool:
+        """A stored state is only usable while the mapping still points at the same products."""
+        return (
+            state is not None
+            and state.source_id == mapping.source_id
+            and state.target_id == mapping.target_id
+        )
+
+    @staticmethod
+    def _target_from_state(state) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """Rebuilds the target item/sizes view from the last pushed values."""
+        item = {"drop_price": state.drop_price, "nal": state.nal}
+        return item, json.loads(state.sizes or "{}")
+
+    @staticmethod
+    def _state_hash(price, nal, sizes: Dict[str, Dict[str, Any]]) -> str:
+        payload = json.dumps([price, nal, sizes], sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
     def _build_sizes_map(self, sizes_list: List[Dict[str, Any]]) -> Dict[int, Dict[str, Dict[str, Any]]]:
         """
@@ -173,11 +452,3 @@ class SyncService:
             
             sizes_map[item_id][val] = size
         return sizes_map
-
-    async def _bounded_update_item(self, sem, client, item_id, price, nal):
-        async with sem:
-            await client.update_item_price(item_id, price, nal)
-
-    async def _bounded_update_size(self, sem, client, size_id, val, qty):
-        async with sem:
-            await client.update_size_quantity(size_id, val, qty)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Standalone sync worker.
+
+Owns scheduling and execution of synchronization runs so the API server can be
+scaled to several uvicorn workers without each of them scheduling its own sync.
+Coordination with the API happens through the database:
+
+- `sync_jobs`: the API enqueues manual runs, the worker enqueues scheduled runs;
+  a worker claims a PENDING job atomically before running it.
+- `worker_heartbeats`: each worker reports liveness; the lowest live worker id
+  is the leader that enqueues scheduled runs, and RUNNING jobs of workers that
+  stopped reporting are failed.
+- `catalog_snapshots`: catalogs downloaded by a run, which the API's product
+  lookup (POST /mappings/validate) loads instead of calling the stores again.
+
+Run with: python worker.py
+"""
+import asyncio
+import os
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import models_db
+import crud
+from database import engine, SessionLocal
+from lookup_service import ProductLookupService
+from sync_service import SyncService
+
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", 5))
+HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", 10))
+STALE_AFTER_SECONDS = float(os.getenv("WORKER_STALE_AFTER_SECONDS", 60))
+
+
+class SyncWorker:
+    def __init__(self):
+        self.hostname = socket.gethostname()
+        self.pid = os.getpid()
+        self.worker_id = f"{self.hostname}-{self.pid}"
+        self.sync_service = SyncService(lookup_service=ProductLookupService())
+        self.current_job_id = None
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        print(f"Worker {self.worker_id} stopping...")
+        self._stop.set()
+
+    def run_forever(self):
+        print(f"Sync worker {self.worker_id} started.")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._tick()
+                except Exception as e:
+                    print(f"Worker tick failed: {e}")
+                self._stop.wait(POLL_SECONDS)
+        finally:
+            db = SessionLocal()
+            try:
+                crud.delete_heartbeat(db, self.worker_id)
+            finally:
+                db.close()
+            print(f"Sync worker {self.worker_id} stopped.")
+
+    def _tick(self):
+        db = SessionLocal()
+        try:
+            now = crud.now_local()
+            stale_before = now - timedelta(seconds=STALE_AFTER_SECONDS)
+            for job in crud.fail_stale_sync_jobs(db, stale_before):
+                print(f"Marked stale sync job {job.id} as FAILED")
+            # Nothing runs between ticks, so a RUNNING job of ours lost its result
+            for job in crud.fail_orphaned_sync_jobs(db, self.worker_id, "Sync result could not be stored"):
+                print(f"Marked orphaned sync job {job.id} as FAILED")
+
+            if self._is_leader(db, stale_before) and self._sync_due(db, now) and not crud.get_active_sync_job(db):
+                job = crud.create_sync_job(db, trigger="scheduled")
+                print(f"Enqueued scheduled sync job {job.id}")
+
+            job = crud.claim_sync_job(db, self.worker_id)
+            if job:
+                print(f"Running sync job {job.id} ({job.trigger})")
+                self.current_job_id = job.id
+                try:
+                    asyncio.run(self.sync_service.run_job(db, job))
+                finally:
+                    self.current_job_id = None
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        """Runs in its own thread so long syncs do not look like a dead worker."""
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                crud.touch_heartbeat(db, self.worker_id, self.hostname, self.pid, self.current_job_id)
+            except Exception as e:
+                print(f"Heartbeat failed: {e}")
+            finally:
+                db.close()
+            self._stop.wait(HEARTBEAT_SECONDS)
+
+    def _is_leader(self, db, stale_before: datetime) -> bool:
+        workers = crud.get_live_workers(db, stale_before)
+        return bool(workers) and workers[0].worker_id == self.worker_id
+
+    @staticmethod
+    def _sync_due(db, now: datetime) -> bool:
+        setting_interval = crud.get_setting(db, "sync_interval")
+        interval = int(setting_interval.value) if setting_interval else 10
+        if interval <= 0:
+            return False
+        # last_sync_run is set at the start of every run, so manual runs reset the schedule too
+        setting_last_run = crud.get_setting(db, "last_sync_run")
+        if not setting_last_run:
+            return True
+        return now - datetime.fromisoformat(setting_last_run.value) >= timedelta(minutes=interval)
+
+
+if __name__ == "__main__":
+    models_db.Base.metadata.create_all(bind=engine)
+    worker = SyncWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
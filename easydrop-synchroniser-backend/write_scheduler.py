@@ -0,0 +1,88 @@
+"""
+Priority-ordered, bounded-concurrency execution of target writes.
+"""
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+PRIORITY_STOCK_OUT = 0  # Size qty -> 0, or any `nal` (availability) transition
+PRIORITY_QTY_DECREASE = 1
+PRIORITY_OTHER = 2  # Quantity increases and price-only changes
+
+PRIORITY_NAMES = {
+    PRIORITY_STOCK_OUT: "stock_out",
+    PRIORITY_QTY_DECREASE: "qty_decrease",
+    PRIORITY_OTHER: "increase_or_price",
+}
+
+
+def item_priority(old_nal, new_nal) -> int:
+    return PRIORITY_STOCK_OUT if old_nal != new_nal else PRIORITY_OTHER
+
+
+def size_priority(old_qty, new_qty) -> int:
+    if new_qty == 0 and old_qty:
+        return PRIORITY_STOCK_OUT
+    if old_qty is not None and new_qty is not None and new_qty < old_qty:
+        return PRIORITY_QTY_DECREASE
+    return PRIORITY_OTHER
+
+
+class PriorityWriteScheduler:
+    """
+    Runs submitted writes with at most `concurrency_limit` in flight, always
+    starting the most urgent pending write next, so a sold-out size is not
+    queued behind thousands of cosmetic price edits.
+
+    A failing write does not stop the others. Each write is submitted with a
+    caller-supplied key (e.g. the mapping id); `run` returns the first error of
+    every key that had a failed write, so the caller can keep the rest.
+    """
+
+    def __init__(self, concurrency_limit: int, on_done: Optional[Callable[[], None]] = None):
+        self.concurrency_limit = concurrency_limit
+        self.on_done = on_done
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()  # Keeps submission order within a priority
+        self._timings: Dict[int, List[float]] = {p: [] for p in PRIORITY_NAMES}
+        self._failures: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._failed: Dict[Hashable, Exception] = {}
+        self._started = 0.0
+
+    def submit(self, priority: int, write: Callable[[], Awaitable[Any]], key: Hashable = None):
+        self._queue.put_nowait((priority, next(self._seq), key, write))
+
+    async def run(self) -> Dict[Hashable, Exception]:
+        """Executes all submitted writes; returns {key: first error} for keys with a failed write."""
+        self._started = time.monotonic()
+        workers = min(self.concurrency_limit, self._queue.qsize())
+        await asyncio.gather(*(self._worker() for _ in range(workers)))
+        return self._failed
+
+    async def _worker(self):
+        while not self._queue.empty():
+            priority, _, key, write = self._queue.get_nowait()
+            try:
+                await write()
+            except Exception as e:
+                self._failures[priority] += 1
+                self._failed.setdefault(key, e)
+                continue
+            self._timings[priority].append(time.monotonic() - self._started)
+            if self.on_done:
+                self.on_done()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for priority, name in PRIORITY_NAMES.items():
+            timings = self._timings[priority]
+            if not timings and not self._failures[priority]:
+                continue
+            report[name] = {
+                "count": len(timings),
+                "failed": self._failures[priority],
+                "avg_seconds": round(sum(timings) / len(timings), 3) if timings else None,
+                "max_seconds": round(max(timings), 3) if timings else None,
+            }
+        return report
@@ -62,6 +62,10 @@ export const api = {
     const res = await axiosInstance.put(`/mappings/${id}`, data);
     return res.data;
   },
+  validateMappings: async (data: { pairs?: { source_id: number; target_id: number }[]; fill_names?: boolean } = {}) => {
+    const res = await axiosInstance.post('/mappings/validate', data);
+    return res.data;
+  },
   deleteMapping: async (id: number) => {
     const res = await axiosInstance.delete(`/mappings/${id}`);
     return res.data;
@@ -86,5 +90,23 @@ export const api = {
       const res = await axiosInstance.get(`/history?limit=${limit}`);
       return res.data;
     },
+    getProductTimeline: async (targetId: number, params: { field?: string; size_val?: string; new_value?: number; limit?: number } = {}) => {
+      const res = await axiosInstance.get(`/products/${targetId}/timeline`, { params });
+      return res.data;
+    },
+    getStats: async (params: { date_from?: string; date_to?: string; top?: number } = {}) => {
+      const res = await axiosInstance.get('/stats', { params });
+      return res.data;
+    },
+    // EventSource cannot send headers: the stream is opened with a short-lived, stream-only token
+    getSyncEventsToken: async () => {
+      const res = await axiosInstance.post('/sync/events/token');
+      return res.data;
+    },
+    syncEventsUrl: (token: string, lastEventId?: string | null) => {
+      const params = new URLSearchParams({ token });
+      if (lastEventId) params.append('last_event_id', lastEventId);
+      return `${API_BASE}/sync/events?${params.toString()}`;
+    },
   };
   
\ No newline at end of file
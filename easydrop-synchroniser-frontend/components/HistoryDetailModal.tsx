@@ -1,6 +1,7 @@
-import React from 'react';
-import { X, Calendar, Clock, CheckCircle2, XCircle, AlertCircle, ArrowLeftRight, Info } from 'lucide-react';
-import { SyncLog } from '../types';
+import React, { useEffect, useState } from 'react';
+import { X, Calendar, Clock, CheckCircle2, XCircle, AlertCircle, ArrowLeftRight, Info, History as HistoryIcon } from 'lucide-react';
+import { SyncLog, ChangeRecord } from '../types';
+import { api } from '../api';
 
 interface HistoryDetailModalProps {
   log: SyncLog | null;
@@ -9,6 +10,19 @@ interface HistoryDetailModalProps {
 }
 
 const HistoryDetailModal: React.FC<HistoryDetailModalProps> = ({ log, isOpen, onClose }) => {
+  const [timeline, setTimeline] = useState<ChangeRecord[]>([]);
+  const targetId = log?.target_id;
+
+  useEffect(() => {
+    setTimeline([]);
+    if (!isOpen || !targetId) return;
+    let cancelled = false;
+    api.getProductTimeline(targetId, { limit: 20 })
+      .then((data) => { if (!cancelled) setTimeline(data); })
+      .catch((e) => console.error("Failed to load product timeline", e));
+    return () => { cancelled = true; };
+  }, [isOpen, targetId]);
+
   if (!isOpen || !log) return null;
 
   const formatDuration = (start: string, end: string | null) => {
@@ -110,6 +124,26 @@ const HistoryDetailModal: React.FC<HistoryDetailModalProps> = ({ log, isOpen, on
                )}
             </div>
           </div>
+
+          {/* Product timeline */}
+          {timeline.length > 0 && (
+            <div>
+              <div className="flex items-center gap-2 mb-3">
+                 <HistoryIcon size={16} className="text-gray-400" />
+                 <h5 className="text-sm font-bold text-gray-900 uppercase tracking-wide">Історія змін товару</h5>
+              </div>
+              <ul className="bg-gray-50 rounded-2xl p-4 border border-gray-100 space-y-2 max-h-48 overflow-y-auto">
+                {timeline.map((change) => (
+                  <li key={change.id} className="flex justify-between gap-4 text-sm text-gray-700">
+                    <span>{change.text}</span>
+                    <span className="text-xs text-gray-400 whitespace-nowrap">
+                      {change.changed_at ? new Date(change.changed_at).toLocaleString('uk-UA') : '-'}
+                    </span>
+                  </li>
+                ))}
+              </ul>
+            </div>
+          )}
         </div>
 
         <div className="p-6 bg-gray-50 border-t border-gray-100 flex justify-end">
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { api } from '../api';
-import { SyncLog } from '../types';
+import { SyncLog, SyncProgress, StatsReport } from '../types';
 import { Clock, CheckCircle2, XCircle, AlertCircle, Calendar, ArrowLeftRight, Info, Timer } from 'lucide-react';
 import HistoryDetailModal from '../components/HistoryDetailModal';
 
@@ -12,17 +12,95 @@ const History: React.FC = () => {
   const [nextSyncCountdown, setNextSyncCountdown] = useState<string>('');
   const [syncInterval, setSyncInterval] = useState<number>(0);
   const [lastSyncTime, setLastSyncTime] = useState<string | null>(null);
+  const [isSyncRunning, setIsSyncRunning] = useState(false);
+  const [syncProgress, setSyncProgress] = useState<SyncProgress | null>(null);
+  const [stats, setStats] = useState<StatsReport | null>(null);
 
   useEffect(() => {
     loadHistory();
+    loadStats();
     fetchSettings();
 
-    const intervalId = setInterval(() => {
-      loadHistory(true);
-      fetchSettings();
-    }, 3000);
+    // Sync state is pushed by the server; history is only reloaded when a run completes
+    let source: EventSource | null = null;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let lastEventId: string | null = null;
+    let attempts = 0;
+    let closed = false;
 
-    return () => clearInterval(intervalId);
+    // Keeps retrying (e.g. through a backend restart) with the delay capped at a minute
+    const scheduleReconnect = () => {
+      if (closed) return;
+      const delay = Math.min(3000 * 2 ** attempts, 60000);
+      attempts += 1;
+      reconnectTimer = setTimeout(connect, delay);
+    };
+
+    const listen = (type: string, handler: (data: any) => void) => {
+      source!.addEventListener(type, (e) => {
+        const message = e as MessageEvent;
+        if (message.lastEventId) lastEventId = message.lastEventId;
+        handler(JSON.parse(message.data));
+      });
+    };
+
+    const connect = async () => {
+      let token: string;
+      try {
+        token = (await api.getSyncEventsToken()).token;
+      } catch (e: any) {
+        console.error("Failed to open sync event stream", e);
+        if (e?.response?.status !== 401) scheduleReconnect();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(api.syncEventsUrl(token, lastEventId));
+      source.addEventListener('open', () => {
+        // Runs may have finished while the stream was down
+        if (attempts > 0) loadHistory(true);
+        attempts = 0;
+      });
+
+      listen('snapshot', (data) => {
+        setSyncInterval(data.sync_interval);
+        if (data.last_sync_run) setLastSyncTime(data.last_sync_run);
+        const running = data.latest_job && ['PENDING', 'RUNNING'].includes(data.latest_job.status);
+        setIsSyncRunning(!!running);
+      });
+      listen('run_started', (data) => {
+        setIsSyncRunning(true);
+        setSyncProgress({ phase: null, done: 0, total: 0 });
+        if (data.started_at) setLastSyncTime(data.started_at);
+      });
+      listen('phase', (data) => {
+        setSyncProgress((prev) => ({ done: prev?.done ?? 0, total: data.total ?? prev?.total ?? 0, phase: data.phase }));
+      });
+      listen('progress', (data) => {
+        setSyncProgress((prev) => ({ phase: prev?.phase ?? null, done: data.done, total: data.total }));
+      });
+      listen('run_completed', () => {
+        setIsSyncRunning(false);
+        setSyncProgress(null);
+        loadHistory(true);
+        loadStats();
+      });
+
+      // Network drops are retried by EventSource itself; once the server refuses the
+      // stream (e.g. the stream token expired) it gives up, so reopen with a new token
+      source.addEventListener('error', () => {
+        if (source?.readyState !== EventSource.CLOSED) return;
+        source.close();
+        scheduleReconnect();
+      });
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      source?.close();
+    };
   }, []);
 
   useEffect(() => {
@@ -34,16 +112,16 @@ const History: React.FC = () => {
     if (!effectiveLastRun) return;
 
     const updateCountdown = () => {
-      // If we are using logs[0] and it's not completed, show "In progress..."
-      // But if we have lastSyncTime, we don't necessarily know if it's completed unless we correlate with logs
-      // However, usually "last_sync_run" is set at START of sync.
-      // So if (now - lastRun) < reasonable_threshold, maybe it's running? 
-      // Simplified: Just show countdown based on start time. 
-      // If the user wants "Sync in progress" status, we might need to check logs[0] status if it matches the time.
-      
-      // Let's keep the "In progress" check if the latest log matches the last run time and is incomplete
-      if (logs.length > 0 && logs[0].started_at === effectiveLastRun && !logs[0].completed_at) {
-         setNextSyncCountdown('Синхронізація триває...');
+      // Running state and progress come from the sync event stream
+      if (isSyncRunning) {
+         const phaseLabels: Record<string, string> = {
+           fetching: 'завантаження каталогу',
+           comparing: 'порівняння',
+           applying: 'оновлення',
+         };
+         const phase = syncProgress?.phase ? ` (${phaseLabels[syncProgress.phase] ?? syncProgress.phase})` : '';
+         const counts = syncProgress && syncProgress.total > 0 ? ` ${syncProgress.done}/${syncProgress.total}` : '';
+         setNextSyncCountdown(`Синхронізація триває${phase}${counts}...`);
          return;
       }
 
@@ -66,7 +144,7 @@ const History: React.FC = () => {
     const timerId = setInterval(updateCountdown, 1000);
 
     return () => clearInterval(timerId);
-  }, [logs, syncInterval, lastSyncTime]);
+  }, [logs, syncInterval, lastSyncTime, isSyncRunning, syncProgress]);
 
   const fetchSettings = async () => {
     try {
@@ -92,6 +170,15 @@ const History: React.FC = () => {
     }
   };
 
+  const loadStats = async () => {
+    try {
+      const data = await api.getStats({ top: 5 });
+      setStats(data);
+    } catch (e) {
+      console.error("Failed to load stats", e);
+    }
+  };
+
   const handleRowClick = (log: SyncLog) => {
     setSelectedLog(log);
     setIsModalOpen(true);
@@ -160,6 +247,41 @@ const History: React.FC = () => {
         </div>
       )}
 
+      {stats && stats.totals.runs > 0 && (
+        <div className="bg-white rounded-2xl border border-gray-200 shadow-sm p-6">
+          <p className="text-xs font-bold text-gray-400 uppercase tracking-wider mb-4">
+            Статистика за {new Date(stats.date_from).toLocaleDateString('uk-UA')} – {new Date(stats.date_to).toLocaleDateString('uk-UA')}
+          </p>
+          <div className="grid grid-cols-2 md:grid-cols-5 gap-4">
+            {[
+              { label: 'Запусків', value: stats.totals.runs },
+              { label: 'Помилок', value: `${(stats.totals.failure_rate * 100).toFixed(1)}%` },
+              { label: 'Змін', value: stats.totals.changes },
+              { label: 'Закінчилось у наявності', value: stats.totals.stock_outs },
+              { label: 'Сер. тривалість', value: `${stats.totals.avg_duration.toFixed(1)}s` },
+            ].map((card) => (
+              <div key={card.label} className="p-4 bg-gray-50 rounded-2xl border border-gray-100">
+                <span className="text-[10px] font-bold text-gray-400 uppercase tracking-wider block mb-1">{card.label}</span>
+                <span className="text-lg font-bold text-gray-900">{card.value}</span>
+              </div>
+            ))}
+          </div>
+          {stats.most_volatile.length > 0 && (
+            <div className="mt-4">
+              <p className="text-xs font-bold text-gray-400 uppercase tracking-wider mb-2">Найчастіше змінювались</p>
+              <ul className="space-y-1">
+                {stats.most_volatile.map((m) => (
+                  <li key={m.mapping_id} className="flex justify-between text-sm text-gray-700">
+                    <span>{m.product_name || "Без назви"} <span className="font-mono text-xs text-gray-400">{m.target_id}</span></span>
+                    <span className="text-gray-500">{m.changes} змін, {m.stock_outs} закінчень</span>
+                  </li>
+                ))}
+              </ul>
+            </div>
+          )}
+        </div>
+      )}
+
       <div className="bg-white rounded-2xl border border-gray-200 shadow-sm overflow-hidden">
         <div className="overflow-x-auto">
           <table className="w-full text-left">
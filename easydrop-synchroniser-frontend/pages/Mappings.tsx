@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
-import { ProductConnection, AppSettings } from '../types';
+import { ProductConnection, AppSettings, MappingValidationReport, MappingValidationResult } from '../types';
 import { api } from '../api';
-import { Plus, Search, Link2, Trash2, Edit } from 'lucide-react';
+import { Plus, Search, Link2, Trash2, Edit, CheckCircle2, AlertCircle } from 'lucide-react';
 import MappingModal from '../components/MappingModal';
 
 const Mappings: React.FC = () => {
@@ -10,6 +10,8 @@ const Mappings: React.FC = () => {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const [editingMapping, setEditingMapping] = useState<ProductConnection | null>(null);
+  const [isValidating, setIsValidating] = useState(false);
+  const [validation, setValidation] = useState<MappingValidationReport | null>(null);
 
   useEffect(() => {
     loadMappings();
@@ -52,6 +54,43 @@ const Mappings: React.FC = () => {
     }
   };
 
+  const handleValidate = async () => {
+    setIsValidating(true);
+    try {
+      const report: MappingValidationReport = await api.validateMappings({ fill_names: true });
+      setValidation(report);
+      if (report.names_filled > 0) {
+        await loadMappings();
+      }
+    } catch (e) {
+      alert("Failed to validate connections");
+      console.error(e);
+    } finally {
+      setIsValidating(false);
+    }
+  };
+
+  const getProblems = (result: MappingValidationResult) => {
+    const problems: string[] = [];
+    if (!result.source_found) problems.push('товар джерела не знайдено');
+    if (!result.target_found) problems.push('цільовий товар не знайдено');
+    if (result.sizes_missing_in_target.length > 0) {
+      problems.push(`немає розмірів у цілі: ${result.sizes_missing_in_target.join(', ')}`);
+    }
+    if (result.sizes_missing_in_source.length > 0) {
+      problems.push(`немає розмірів у джерелі: ${result.sizes_missing_in_source.join(', ')}`);
+    }
+    return problems;
+  };
+
+  const problemsByMapping = new Map<number, string[]>();
+  validation?.results.forEach((result) => {
+    const problems = getProblems(result);
+    if (result.mapping_id !== null && problems.length > 0) {
+      problemsByMapping.set(result.mapping_id, problems);
+    }
+  });
+
   const handleEdit = (mapping: ProductConnection) => {
     setEditingMapping(mapping);
     setIsModalOpen(true);
@@ -88,16 +127,46 @@ const Mappings: React.FC = () => {
           <h1 className="text-2xl font-bold text-gray-900">Зв’язки товарів</h1>
           <p className="text-gray-500 mt-1 text-sm">Керування відповідністю ідентифікаторів між двома CRM.</p>
         </div>
-        <button
-          onClick={() => { setEditingMapping(null); setIsModalOpen(true); }}
-          className="flex items-center gap-2 px-5 py-2.5 text-sm font-semibold text-white bg-blue-600 rounded-xl hover:bg-blue-700 shadow-lg shadow-blue-100 transition-all active:scale-95"
-        >
-          <Plus size={18} />
-          Додати зв’язок
-        </button>
+        <div className="flex items-center gap-3">
+          <button
+            onClick={handleValidate}
+            disabled={isValidating}
+            className="flex items-center gap-2 px-5 py-2.5 text-sm font-semibold text-gray-700 bg-white border border-gray-200 rounded-xl hover:bg-gray-50 shadow-sm transition-all active:scale-95 disabled:opacity-50"
+          >
+            <CheckCircle2 size={18} />
+            {isValidating ? 'Перевірка...' : 'Перевірити зв’язки'}
+          </button>
+          <button
+            onClick={() => { setEditingMapping(null); setIsModalOpen(true); }}
+            className="flex items-center gap-2 px-5 py-2.5 text-sm font-semibold text-white bg-blue-600 rounded-xl hover:bg-blue-700 shadow-lg shadow-blue-100 transition-all active:scale-95"
+          >
+            <Plus size={18} />
+            Додати зв’язок
+          </button>
+        </div>
       </header>
 
       <div className="space-y-6">
+        {validation && (
+          <div className={`p-4 rounded-2xl border text-sm ${problemsByMapping.size > 0 ? 'bg-amber-50 border-amber-100 text-amber-800' : 'bg-green-50 border-green-100 text-green-800'}`}>
+            {problemsByMapping.size > 0 ? (
+              <div className="flex items-center gap-2 font-semibold">
+                <AlertCircle size={16} />
+                Проблемних зв’язків: {problemsByMapping.size} з {validation.results.length}
+              </div>
+            ) : (
+              <div className="flex items-center gap-2 font-semibold">
+                <CheckCircle2 size={16} />
+                Усі зв’язки ({validation.results.length}) коректні
+              </div>
+            )}
+            <div className="mt-1 text-xs opacity-80">
+              Відсутні в джерелі: {validation.missing_source_ids.length} · Відсутні в цілі: {validation.missing_target_ids.length} · Розбіжності розмірів: {validation.size_mismatches}
+              {validation.names_filled > 0 && ` · Заповнено назв: ${validation.names_filled}`}
+            </div>
+          </div>
+        )}
+
         <div className="relative group max-w-md">
           <Search className="absolute left-4 top-1/2 -translate-y-1/2 text-gray-400 group-focus-within:text-blue-500 transition-colors" size={18} />
           <input
@@ -128,6 +197,12 @@ const Mappings: React.FC = () => {
                       <div className="text-[10px] text-gray-400 mt-0.5 uppercase tracking-tight">
                         Створено: {conn.created_at ? new Date(conn.created_at).toLocaleDateString('uk-UA') : '-'}
                       </div>
+                      {problemsByMapping.has(conn.id) && (
+                        <div className="flex items-start gap-1 mt-1 text-xs text-amber-700">
+                          <AlertCircle size={12} className="mt-0.5 flex-shrink-0" />
+                          {problemsByMapping.get(conn.id)!.join('; ')}
+                        </div>
+                      )}
                     </td>
                     <td className="px-6 py-4">
                       <span className="font-mono text-xs font-medium bg-gray-100 text-gray-700 px-2.5 py-1 rounded-lg border border-gray-200">
@@ -100,12 +100,28 @@ const Settings: React.FC = () => {
                   <span className="text-gray-500 text-sm font-medium">хвилин</span>
                 </div>
               </div>
+
+              <div className="flex flex-col gap-2">
+                <label className="text-sm font-medium text-gray-700">Повна звірка з цільовим магазином (хвилини)</label>
+                <div className="flex items-center gap-3">
+                  <input
+                    type="number"
+                    min="1"
+                    max="10080"
+                    value={settings.full_reconcile_interval ?? 360}
+                    onChange={(e) => setSettings({ ...settings, full_reconcile_interval: parseInt(e.target.value) || 0 })}
+                    className="w-32 px-4 py-2.5 border border-gray-300 rounded-xl focus:ring-2 focus:ring-blue-500 outline-none text-center font-bold"
+                  />
+                  <span className="text-gray-500 text-sm font-medium">хвилин</span>
+                </div>
+              </div>
               
               <div className="bg-blue-50 border border-blue-100 rounded-xl p-4 flex gap-3">
                 <Info size={18} className="text-blue-500 mt-0.5 flex-shrink-0" />
                 <p className="text-xs text-blue-800 leading-relaxed">
                   Система автоматично перевірятиме наявність змін у джерелі кожні <strong>{settings.sync_interval}</strong> хв.
                   Менший інтервал збільшує навантаження на API.
+                  Між повними звірками цільовий каталог не завантажується — ручні зміни в ньому буде виявлено під час наступної звірки.
                 </p>
               </div>
             </div>
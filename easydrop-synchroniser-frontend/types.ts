@@ -11,6 +11,7 @@ export type ViewType = 'mappings' | 'settings' | 'history';
 
 export interface AppSettings {
   sync_interval: number; // in minutes
+  full_reconcile_interval?: number; // in minutes
   last_sync_run?: string;
 }
 
@@ -21,4 +22,73 @@ export interface SyncLog {
   status: 'SUCCESS' | 'FAILED' | 'PARTIAL';
   items_updated: number;
   details: string | null;
+  product_name?: string | null;
+  source_id?: number | null;
+  target_id?: number | null;
+  changes?: ChangeRecord[];
+}
+
+export interface ChangeRecord {
+  id: number;
+  job_id: number | null;
+  target_id: number;
+  field: 'drop_price' | 'nal' | 'qty';
+  size_val: string | null;
+  old_value: number | null;
+  new_value: number | null;
+  changed_at: string | null;
+  text: string | null;
+}
+
+export interface SyncProgress {
+  phase: string | null;
+  done: number;
+  total: number;
+}
+
+export interface MappingValidationResult {
+  mapping_id: number | null;
+  source_id: number;
+  target_id: number;
+  source_found: boolean;
+  target_found: boolean;
+  product_name: string | null;
+  sizes_missing_in_target: string[];
+  sizes_missing_in_source: string[];
+}
+
+export interface MappingValidationReport {
+  results: MappingValidationResult[];
+  missing_source_ids: number[];
+  missing_target_ids: number[];
+  size_mismatches: number;
+  names_filled: number;
+}
+
+export interface StatsTotals {
+  runs: number;
+  failed_runs: number;
+  failure_rate: number;
+  changes: number;
+  price_changes: number;
+  stock_outs: number;
+  avg_duration: number;
+  max_duration: number;
+}
+
+export interface StatsMapping {
+  mapping_id: number;
+  source_id: number | null;
+  target_id: number | null;
+  product_name: string | null;
+  changes: number;
+  price_changes: number;
+  stock_outs: number;
+}
+
+export interface StatsReport {
+  date_from: string;
+  date_to: string;
+  totals: StatsTotals;
+  most_volatile: StatsMapping[];
 }